@@ -0,0 +1,215 @@
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import etl
+import features
+import model_training
+from generate_synthetic_data import BASE_TICKERS, generate_share_prices
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing etl already configured its own log file)
+log_file = os.path.join(log_dir, "benchmark.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
+)
+
+def make_price_frame(n_tickers, n_days, seed=42):
+    """Build an in-memory long price frame sorted by Ticker and Date."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=n_days).strftime("%Y-%m-%d")
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_tickers, n_days)), axis=1))
+    return pd.DataFrame({
+        "Ticker": np.repeat(tickers, n_days),
+        "Date": np.tile(dates, n_tickers),
+        "Close": close.ravel(),
+    })
+
+def time_call(func, repeat):
+    """Return the best wall time in seconds over repeat calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_targets(ticker_counts, n_days, repeat):
+    """Time drop_last_rows and add_targets for growing universes."""
+    results = []
+    for n_tickers in ticker_counts:
+        df = make_price_frame(n_tickers, n_days)
+        trim_s = time_call(lambda: etl.drop_last_rows(df, 30), repeat)
+        target_s = time_call(lambda: etl.add_targets(df.copy()), repeat)
+        results.append({
+            "tickers": n_tickers,
+            "rows": len(df),
+            "drop_last_rows_s": trim_s,
+            "add_targets_s": target_s,
+            "ns_per_row": (trim_s + target_s) / len(df) * 1e9,
+        })
+        logging.info(f"Targets benchmark: {results[-1]}")
+    return pd.DataFrame(results)
+
+# Largest difference from pandas rolling tolerated by the features benchmark
+FEATURE_TOLERANCE = 1e-6
+
+def indicator_errors(df):
+    """
+    Largest difference (absolute, relative above 1) of the rolling indicators from a per-ticker
+    pandas rolling, for an add_indicators() frame sorted by Ticker and Date.
+    """
+    grouped = df.groupby("Ticker", observed=True, sort=False)
+    log_return = np.log(df["Close"] / grouped["Close"].shift(1))
+    volume = grouped["Volume"].rolling(features.VOLUME_Z_WINDOW)
+    window = features.VOLATILITY_WINDOWS[-1]
+    expected = {
+        f"Volatility_{window}": log_return.groupby(df["Ticker"], observed=True, sort=False).rolling(window).std().droplevel(0),
+        f"Volume_Z_{features.VOLUME_Z_WINDOW}": (df["Volume"] - volume.mean().droplevel(0)) / volume.std().droplevel(0),
+    }
+    errors = {}
+    for name, values in expected.items():
+        values = values.sort_index().to_numpy()
+        errors[name] = float(np.nanmax(np.abs(df[name].to_numpy(np.float64) - values) / np.maximum(1, np.abs(values))))
+    return errors
+
+def bench_features(ticker_counts, n_days, repeat):
+    """
+    Throughput of the technical indicators for growing universes, checked against pandas rolling.
+
+    Volumes span very different scales across tickers (from thousands to about a billion
+    shares a day), which is where numerically careless window sums go wrong.
+    """
+    results = []
+    for n_tickers in ticker_counts:
+        df = make_price_frame(n_tickers, n_days)
+        df["Ticker"] = df["Ticker"].astype("category")
+        df["High"] = df["Close"] * 1.01
+        df["Low"] = df["Close"] * 0.99
+        rng = np.random.default_rng(42)
+        volume_scale = np.repeat(np.exp(rng.uniform(np.log(5e3), np.log(8e8), n_tickers)), n_days)
+        df["Volume"] = volume_scale * rng.lognormal(0, 0.5, len(df))
+        seconds = time_call(lambda: features.add_indicators(df.copy()), repeat)
+
+        errors = indicator_errors(features.add_indicators(df.copy()))
+        if max(errors.values()) > FEATURE_TOLERANCE:
+            raise ValueError(f"Indicators differ from pandas rolling by {errors} with {n_tickers} tickers.")
+        results.append({
+            "tickers": n_tickers,
+            "rows": len(df),
+            "add_indicators_s": seconds,
+            "rows_per_s": len(df) / seconds,
+            **{f"max_error_{name}": error for name, error in errors.items()},
+        })
+        logging.info(f"Features benchmark: {results[-1]}")
+    return pd.DataFrame(results)
+
+def synthetic_file(n_tickers, start, end, seed=42):
+    """Path of a synthetic share prices file for n_tickers, generated on first use."""
+    path = os.path.join("..", "data", "synthetic", f"us-shareprices-daily-{n_tickers}-{start}-{end}-{seed}.zip")
+    if not os.path.exists(path):
+        generate_share_prices(path, n_tickers, start, end, seed=seed)
+    return path
+
+def bench_pipeline(ticker_counts, start, end):
+    """Time the ETL (long layout, every ticker) and model training on synthetic universes.
+
+    Training uses the default five tickers as the peer set, so the feature count stays
+    fixed and the cost grows with the number of rows. Artifacts go to a temporary directory.
+    """
+    results = []
+    for n_tickers in ticker_counts:
+        data_file = synthetic_file(n_tickers, start, end)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start_s = time.perf_counter()
+            etl.run_full(data_file, None, etl.DEFAULT_CHUNKSIZE, tmp_dir, layout="long")
+            etl_s = time.perf_counter() - start_s
+
+            start_s = time.perf_counter()
+            features, target = model_training.load_data(os.path.join(tmp_dir, etl.PROCESSED_FILE), peers=BASE_TICKERS)
+            model_training.train_xgb(features, target, model_path=os.path.join(tmp_dir, "xgb.joblib"))
+            training_s = time.perf_counter() - start_s
+
+        results.append({
+            "tickers": n_tickers,
+            "rows": len(target),
+            "etl_s": etl_s,
+            "training_s": training_s,
+            "peak_rss_mb": etl.peak_memory_mb(),
+        })
+        logging.info(f"Pipeline benchmark: {results[-1]}")
+    return pd.DataFrame(results)
+
+def bench_backtest(ticker_counts, start, end, seed=42):
+    """Time the app's SignalStrategy backtest on synthetic prices with random signals, one run per ticker."""
+    # The strategy lives in the Streamlit app, which needs its own requirements installed
+    sys.path.insert(0, os.path.join("..", "streamlit_app"))
+    from backtesting import Backtest
+    from utils import SignalStrategy
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for n_tickers in ticker_counts:
+        prices = etl.load_price_data(synthetic_file(n_tickers, start, end), None)
+        start_s = time.perf_counter()
+        for _, bars in prices.groupby("Ticker", observed=True):
+            bars = bars.set_index("Date").sort_index()
+            bars["signal"] = rng.integers(0, 2, len(bars))
+            Backtest(bars, SignalStrategy, cash=10_000, commission=.002).run(tp=0.005, sl=0.005)
+        backtest_s = time.perf_counter() - start_s
+
+        results.append({"tickers": n_tickers, "rows": len(prices), "backtest_s": backtest_s})
+        logging.info(f"Backtest benchmark: {results[-1]}")
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the machine learning pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    targets_parser = subparsers.add_parser("targets", help="Scaling of the per-ticker trimming and labelling.")
+    targets_parser.add_argument("--tickers", type=int, nargs="+", default=[5, 50, 500, 5000])
+    targets_parser.add_argument("--days", type=int, default=250)
+    targets_parser.add_argument("--repeat", type=int, default=3)
+
+    features_parser = subparsers.add_parser("features", help="Throughput of the technical indicators.")
+    features_parser.add_argument("--tickers", type=int, nargs="+", default=[50, 500, 5000])
+    features_parser.add_argument("--days", type=int, default=500)
+    features_parser.add_argument("--repeat", type=int, default=3)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="ETL and training on synthetic SimFin-format universes.")
+    pipeline_parser.add_argument("--tickers", type=int, nargs="+", default=[5, 500, 5000])
+    pipeline_parser.add_argument("--start", default="2015-01-01")
+    pipeline_parser.add_argument("--end", default="2024-12-31")
+
+    backtest_parser = subparsers.add_parser("backtest", help="The app's backtest strategy on synthetic universes.")
+    backtest_parser.add_argument("--tickers", type=int, nargs="+", default=[5, 500, 5000])
+    backtest_parser.add_argument("--start", default="2015-01-01")
+    backtest_parser.add_argument("--end", default="2024-12-31")
+
+    args = parser.parse_args()
+    logging.info(f"Running {args.benchmark} benchmark.")
+
+    if args.benchmark == "targets":
+        # Constant ns_per_row across universe sizes means linear scaling
+        results = bench_targets(args.tickers, args.days, args.repeat)
+    elif args.benchmark == "features":
+        results = bench_features(args.tickers, args.days, args.repeat)
+    elif args.benchmark == "pipeline":
+        results = bench_pipeline(args.tickers, args.start, args.end)
+    elif args.benchmark == "backtest":
+        results = bench_backtest(args.tickers, args.start, args.end)
+
+    print(results.to_string(index=False))
@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+import xgboost as xgb
+import argparse
+import joblib
+import logging
+import multiprocessing
+import os
+import time
+from xgboost import collective
+from xgboost.tracker import RabitTracker
+
+from feature_store import FeatureStore
+from model_training import (
+    DATA_FILE, EARLY_STOPPING_ROUNDS, MODEL_FILE, NUM_ROUNDS, XGB_PARAMS,
+    column_names, features_from_frame, is_feature_column, is_long_layout, load_dates, load_labelled, peak_memory_mb, read_columns,
+    save_model_metadata, split_rows, training_metadata,
+)
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing model_training already configured its own log file)
+log_file = os.path.join(log_dir, "distributed_training.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(process)d - %(message)s",
+    force=True,
+)
+
+PARTITIONS = ["ticker", "time"]
+
+def partition_filter(data_file, rank, world_size, partition="ticker"):
+    """
+    Parquet filter selecting this worker's share of the processed dataset.
+
+    "ticker" deals the sorted tickers out round-robin; "time" gives each worker one contiguous
+    block of dates. Only the Ticker or Date column of the whole file is read to decide this.
+    """
+    if partition == "ticker":
+        tickers = sorted(read_columns(data_file, ["Ticker"])["Ticker"].astype(str).unique())
+        return [("Ticker", "in", tickers[rank::world_size])]
+
+    dates = np.unique(read_columns(data_file, ["Date"])["Date"].to_numpy())
+    block = np.array_split(dates, world_size)[rank]
+    return [("Date", ">=", pd.Timestamp(block[0])), ("Date", "<=", pd.Timestamp(block[-1]))]
+
+def load_partition(data_file, rank, world_size, partition="ticker"):
+    """Load features and target for one worker's partition only (Parquet files)."""
+    columns = column_names(data_file)
+    filters = partition_filter(data_file, rank, world_size, partition)
+    wanted = [col for col in columns if is_feature_column(col) or col in ["Date", "Ticker", "Target"]]
+    df = pq.read_table(data_file, columns=wanted, filters=filters, memory_map=True).to_pandas()
+
+    # Cross-ticker features come from the full price grid, which is small next to the rows
+    store = FeatureStore.from_parquet(data_file) if is_long_layout(columns) else None
+    return features_from_frame(df, store=store)
+
+def run_worker(tracker_args, data_file, partition, model_path, nthread):
+    """
+    One training process: join the tracker, load its partition and train collectively.
+
+    Histograms, split decisions and evaluation metrics are all-reduced across the workers, so
+    every worker ends up with the same booster; rank 0 saves it.
+    """
+    with collective.CommunicatorContext(**tracker_args):
+        rank, world_size = collective.get_rank(), collective.get_world_size()
+        started = time.perf_counter()
+        try:
+            features, target = load_partition(data_file, rank, world_size, partition)
+            train_rows, test_rows = split_rows(target)
+            X_train, X_test = features.iloc[train_rows], features.iloc[test_rows]
+            y_train, y_test = target.iloc[train_rows], target.iloc[test_rows]
+            logging.info(f"Worker {rank}/{world_size}: {len(X_train)} training and {len(X_test)} testing rows of its {partition} partition.")
+
+            dtrain = xgb.DMatrix(X_train, label=y_train, nthread=nthread)
+            dtest = xgb.DMatrix(X_test, label=y_test, nthread=nthread)
+            params = dict(XGB_PARAMS, tree_method="hist", nthread=nthread)
+            model = xgb.train(params, dtrain, NUM_ROUNDS, evals=[(dtrain, "train"), (dtest, "eval")],
+                              early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+
+            accuracy = float(((model.predict(dtest) > 0.5).astype(int) == y_test.to_numpy()).mean())
+            logging.info(
+                f"Worker {rank}: trained {model.num_boosted_rounds()} rounds in {time.perf_counter() - started:.2f}s, "
+                f"local test accuracy {accuracy:.4f}, peak memory {peak_memory_mb():.1f} MB."
+            )
+            if rank == 0:
+                joblib.dump(model, model_path)
+                if model_path == MODEL_FILE:
+                    save_model_metadata(training_metadata(model, load_dates(data_file), load_labelled(data_file)))
+                logging.info(f"Model saved at {model_path}.")
+
+        except Exception as e:
+            logging.error(f"Error in distributed worker {rank}: {e}", exc_info=True)
+            raise
+
+def train_distributed(data_file, n_workers, partition="ticker", model_path=MODEL_FILE, host_ip="127.0.0.1"):
+    """
+    Train with n_workers local processes coordinated by XGBoost's tracker, each holding only
+    its own partition of the data. Runs entirely on one machine.
+    """
+    logging.info(f"Starting distributed training with {n_workers} local workers ({partition} partitions).")
+
+    try:
+        started = time.perf_counter()
+        tracker = RabitTracker(n_workers=n_workers, host_ip=host_ip)
+        tracker.start()
+        nthread = max(1, os.cpu_count() // n_workers)
+
+        # Spawned (not forked) workers so no XGBoost thread state is inherited
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=run_worker, args=(tracker.worker_args(), data_file, partition, model_path, nthread))
+            for _ in range(n_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        tracker.wait_for()
+
+        failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {n_workers} workers failed (exit codes {failed}).")
+        logging.info(f"Distributed training finished in {time.perf_counter() - started:.2f}s.")
+
+    except Exception as e:
+        logging.error(f"Error during distributed training: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed XGBoost training over partitions of the processed data.")
+    parser.add_argument("--role", choices=["local", "tracker", "worker"], default="local",
+                        help="local: tracker and workers on this machine; tracker/worker: one part of a multi-host run.")
+    parser.add_argument("--input", default=DATA_FILE, help="Processed Parquet data from the ETL script (every host needs a copy).")
+    parser.add_argument("--workers", type=int, default=2, help="Total number of workers.")
+    parser.add_argument("--partition", choices=PARTITIONS, default="ticker", help="Split the rows across workers by ticker or by date range.")
+    parser.add_argument("--host-ip", default="127.0.0.1", help="Address the tracker listens on (use the LAN address for multi-host runs).")
+    parser.add_argument("--tracker-port", type=int, default=0, help="Tracker port; the tracker role prints the one it picked when 0.")
+    parser.add_argument("--nthread", type=int, default=os.cpu_count(), help="XGBoost threads per worker (worker role).")
+    args = parser.parse_args()
+
+    logging.info(f"Distributed training started ({args.role} role).")
+
+    try:
+        if args.role == "local":
+            train_distributed(args.input, args.workers, args.partition, host_ip=args.host_ip)
+            print(f"Distributed training completed. Model saved at {MODEL_FILE}.")
+        elif args.role == "tracker":
+            # Multi-host: start this first, then one "--role worker" per host with the printed address
+            tracker = RabitTracker(n_workers=args.workers, host_ip=args.host_ip, port=args.tracker_port)
+            tracker.start()
+            print(f"Tracker waiting for {args.workers} workers: {tracker.worker_args()}")
+            tracker.wait_for()
+        else:
+            tracker_args = {"dmlc_tracker_uri": args.host_ip, "dmlc_tracker_port": args.tracker_port}
+            run_worker(tracker_args, args.input, args.partition, MODEL_FILE, args.nthread)
+
+    except Exception as e:
+        logging.critical("Distributed training failed.", exc_info=True)
+        raise
@@ -1,6 +1,18 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import numpy as np
+import argparse
+import json
 import logging
 import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from features import add_indicators, max_lookback
+from schema import DATE_FORMAT, HORIZON_LABEL_PREFIXES, RAW_PRICE_DTYPES, TARGET_DTYPE, ticker_dtype
 
 # Ensure required directories exist
 log_dir = "./logging"
@@ -16,32 +28,197 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-def process_stock_data():
-    logging.info("Starting stock data processing.")
+# Bulk download from SimFin and the universe used for training
+DATA_FILE = "../data/us-shareprices-daily.zip"
+SELECTED_TICKERS = ["AAPL", "MSFT", "BRO", "FAST", "ODFL"]
+DEFAULT_CHUNKSIZE = 1_000_000
+
+# Processed dataset handed over to model_training.py
+PROCESSED_FILE = "processed_stock_data.parquet"
+PROCESSED_CSV_FILE = "processed_stock_data.csv"
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+# Per-ticker high-water marks used by the incremental mode
+WATERMARK_FILE = "etl_watermark.json"
+TRIM_ROWS = 30
+
+LABEL_COLUMNS = ["Close_Ticker_Shifted", "Target"]
+
+# Forward horizons (trading days) of the optional multi-horizon labels; up to TRIM_ROWS every kept row has one
+LABEL_HORIZONS = [1, 5, 20]
+
+def peak_memory_mb():
+    """Return the peak resident set size of the current process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_price_data(data_file=DATA_FILE, tickers=SELECTED_TICKERS, chunksize=DEFAULT_CHUNKSIZE, since=None):
+    """Stream the SimFin share prices file in chunks, keeping only the selected tickers.
+
+    If since is given (as YYYY-MM-DD), only rows dated on or after it are kept.
+    Ticker is parsed as a categorical of the selected tickers, so any other ticker
+    becomes NaN and is dropped; prices and volumes are parsed as float32.
+    tickers=None keeps every ticker in the file.
+    """
+    logging.info(f"Streaming stock data from {data_file} in chunks of {chunksize} rows.")
+    start = time.perf_counter()
+
+    # Only these columns are parsed from the bulk file (Dividend and SimFinId are never read)
+    reader = pd.read_csv(
+        data_file,
+        delimiter=";",
+        usecols=list(RAW_PRICE_DTYPES),
+        dtype=RAW_PRICE_DTYPES if tickers is None else {**RAW_PRICE_DTYPES, "Ticker": ticker_dtype(tickers)},
+        chunksize=chunksize,
+    )
+
+    # Filter each chunk as it is parsed so the full file is never held in memory
+    rows_read = 0
+    chunks = []
+    for chunk in reader:
+        rows_read += len(chunk)
+        mask = chunk["Ticker"].notna()
+        if since is not None:
+            mask &= chunk["Date"] >= since
+        chunks.append(chunk[mask])
+
+    prices_df = pd.concat(chunks, ignore_index=True)
+    prices_df["Date"] = pd.to_datetime(prices_df["Date"], format=DATE_FORMAT)
+    if tickers is None:
+        prices_df["Ticker"] = prices_df["Ticker"].astype(ticker_dtype(prices_df["Ticker"].unique()))
+
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Read {rows_read} rows in {elapsed:.2f}s ({rows_read / max(elapsed, 1e-9):,.0f} rows/s), "
+        f"kept {prices_df.shape[0]} rows for {prices_df['Ticker'].nunique()} tickers. Peak memory: {peak_memory_mb():.1f} MB."
+    )
+    return prices_df
+
+def load_raw_through(data_file=DATA_FILE, tickers=SELECTED_TICKERS, chunksize=DEFAULT_CHUNKSIZE):
+    """Last Date (as YYYY-MM-DD) of every selected ticker in the bulk file, by Ticker.
+
+    Only the Ticker and Date columns are parsed. tickers=None covers every ticker in the file.
+    """
+    reader = pd.read_csv(
+        data_file,
+        delimiter=";",
+        usecols=["Ticker", "Date"],
+        dtype={"Ticker": RAW_PRICE_DTYPES["Ticker"] if tickers is None else ticker_dtype(tickers), "Date": str},
+        chunksize=chunksize,
+    )
+    latest = [chunk.dropna(subset=["Ticker"]).astype({"Ticker": str}).groupby("Ticker")["Date"].max() for chunk in reader]
+    return pd.concat(latest).groupby(level=0).max()
+
+def drop_last_rows(df, n):
+    """Drop the last n rows of every ticker. Expects df sorted by Ticker and Date."""
+    rows_from_end = df.groupby("Ticker", sort=False, observed=True).cumcount(ascending=False)
+    return df[rows_from_end.to_numpy() >= n].reset_index(drop=True)
+
+def add_targets(df):
+    """Add the next-day close (Close_Ticker_Shifted) and the up/down label (Target) per ticker.
+
+    Expects df sorted by Ticker and Date. The last row of each ticker has no next
+    close and is labelled 0.
+    """
+    df["Close_Ticker_Shifted"] = df.groupby("Ticker", sort=False, observed=True)["Close"].shift(-1)
+    df["Target"] = (df["Close_Ticker_Shifted"] > df["Close"]).astype(TARGET_DTYPE)
+    return df
+
+def add_horizon_labels(df, horizons):
+    """Add the forward return (Forward_Return_{h}) and its up/down label (Target_{h}) for every horizon.
+
+    Expects df sorted by Ticker and Date. All horizons come from the same close array:
+    row i's h-day future is row i + h when both belong to the same ticker, else NaN (label 0).
+    """
+    close = df["Close"].to_numpy(np.float64)
+    codes = pd.factorize(df["Ticker"])[0]
+    for h in horizons:
+        future = np.full(len(close), np.nan)
+        future[:-h] = close[h:]
+        future[:-h][codes[h:] != codes[:-h]] = np.nan
+        df[f"Forward_Return_{h}"] = (future / close - 1).astype(np.float32)
+        df[f"Target_{h}"] = (future > close).astype(TARGET_DTYPE)
+    return df
+
+def label_columns(df):
+    """The label columns of df, which the processed dataset keeps last."""
+    return LABEL_COLUMNS + [col for col in df.columns if col.startswith(HORIZON_LABEL_PREFIXES)]
+
+def write_processed_data(df, output_dir, export_csv=False):
+    """Write the processed dataset as compressed Parquet, optionally exporting a CSV copy too."""
+    output_file = os.path.join(output_dir, PROCESSED_FILE)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        output_file,
+        compression=PARQUET_COMPRESSION,
+        row_group_size=PARQUET_ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    logging.info(f"Wrote {table.num_rows} rows to {output_file} ({os.path.getsize(output_file) / 1e6:.2f} MB).")
+
+    if export_csv:
+        csv_file = os.path.join(output_dir, PROCESSED_CSV_FILE)
+        df.to_csv(csv_file, index=False)
+        logging.info(f"Exported CSV copy to {csv_file}.")
+
+    return output_file
+
+def prepare_tickers(tickers_df, features=False, horizons=()):
+    """Per-ticker stage: sort, add the indicators and multi-horizon labels (optional), drop the
+    last 30 rows and label. Works on any subset of tickers."""
+    df = tickers_df.sort_values(by=["Ticker", "Date"])
+    if features:
+        df = add_indicators(df)
+    if horizons:
+        # Before trimming, so the dropped rows still provide the kept rows' future closes
+        df = add_horizon_labels(df, horizons)
+    df = drop_last_rows(df, TRIM_ROWS)
+    return add_targets(df)
+
+def shard_tickers(tickers_df, n_shards):
+    """Split the frame into contiguous ranges of the sorted tickers, balanced by row count."""
+    counts = tickers_df["Ticker"].value_counts().sort_index()
+    boundaries = np.searchsorted(counts.cumsum().to_numpy(), np.linspace(0, counts.sum(), n_shards + 1)[1:-1])
+    shard_of_ticker = pd.Series(np.searchsorted(boundaries, np.arange(len(counts)), side="right"), index=counts.index)
+    shard_ids = tickers_df["Ticker"].map(shard_of_ticker).to_numpy()
+    return [tickers_df[shard_ids == shard] for shard in range(n_shards) if (shard_ids == shard).any()]
 
+def prepare_tickers_sharded(tickers_df, workers, features=False, horizons=()):
+    """Run the per-ticker stage across a process pool, one shard of tickers per task.
+
+    Shards are contiguous ranges of the sorted tickers and results are concatenated in
+    shard order, so the output is identical to prepare_tickers on the whole frame.
+    """
+    shards = shard_tickers(tickers_df, workers)
+    logging.info(f"Processing {len(shards)} ticker shards with {workers} worker processes.")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partitions = list(executor.map(partial(prepare_tickers, features=features, horizons=horizons), shards))
+    return pd.concat(partitions, ignore_index=True)
+
+def transform_stock_data(tickers_df, workers=1, layout="wide", features=False, horizons=()):
+    """Trim, pivot, merge and label the filtered share prices.
+
+    With layout="long" the pivot/merge is skipped and one row per (Ticker, Date) is kept
+    with its own prices; the cross-ticker features are then built by feature_store.FeatureStore.
+    With features=True each row also gets the technical indicators of features.py, and
+    horizons adds a forward return and up/down label per horizon next to Target.
+    """
     try:
-        # Stock data downloaded:
-        logging.info("Loading stock data from ZIP file.")
-        prices_df = pd.read_csv("../data/us-shareprices-daily.zip", delimiter=";")
-        logging.info(f"Stock data loaded successfully with {prices_df.shape[0]} rows and {prices_df.shape[1]} columns.")
-
-        # Filter tickers
-        selected_tickers = ["AAPL", "MSFT", "BRO", "FAST", "ODFL"]
-        logging.info(f"Filtering data for tickers: {selected_tickers}.")
-        tickers_df = prices_df[prices_df["Ticker"].isin(selected_tickers)]
-        logging.info(f"Filtered data contains {tickers_df.shape[0]} rows.")
-
-        tickers_df.drop(columns=['Dividend', 'SimFinId'], inplace=True)
-        logging.info("Dropped unnecessary columns: Dividend, SimFinId.")
-
-        tickers_df = tickers_df.sort_values(by=["Ticker", "Date"])
-        logging.info("Sorted data by Ticker and Date.")
-
-        # Remove last 30 rows per Ticker
-        logging.info("Removing last 30 rows per Ticker.")
-        df_cleaned = tickers_df.groupby('Ticker').apply(lambda x: x.iloc[:-30]).reset_index(drop=True)
+        # Sort, remove last 30 rows and compute the next day close and Target per Ticker
+        logging.info("Sorting, removing last 30 rows and labelling per Ticker.")
+        if workers > 1:
+            df_cleaned = prepare_tickers_sharded(tickers_df, workers, features, horizons)
+        else:
+            df_cleaned = prepare_tickers(tickers_df, features, horizons)
         logging.info(f"Cleaned data contains {df_cleaned.shape[0]} rows after removing last 30 rows per ticker.")
 
+        if layout == "long":
+            labels = label_columns(df_cleaned)
+            df_cleaned = df_cleaned[[col for col in df_cleaned.columns if col not in labels] + labels]
+            logging.info(f"Stock data processing completed successfully (long layout). Peak memory: {peak_memory_mb():.1f} MB.")
+            return df_cleaned
+
         # Pivot table
         logging.info("Creating pivot table.")
         pivoted_df = df_cleaned.pivot(index="Date", columns="Ticker", values=["Open", "High", "Low", "Close", "Adj. Close", "Volume"])
@@ -57,49 +234,164 @@ def process_stock_data():
         merged_df = df_cleaned.merge(pivoted_df, on="Date", how="left")
         logging.info(f"Merged data contains {merged_df.shape[0]} rows and {merged_df.shape[1]} columns.")
 
-        # Drop unnecessary columns
+        # Drop unnecessary columns and keep the labels last
         cols_to_drop = ["Open", "High", "Low", "Close", "Adj. Close", "Volume"]
         merged_df.drop(columns=cols_to_drop, inplace=True)
+        labels = label_columns(merged_df)
+        merged_df = merged_df[[col for col in merged_df.columns if col not in labels] + labels]
         logging.info(f"Dropped columns: {cols_to_drop}.")
 
-        # Initialize shifted close column
-        merged_df['Close_Ticker_Shifted'] = None
-        logging.info("Initialized Close_Ticker_Shifted column.")
-
-        # Process each ticker separately
-        for ticker in merged_df['Ticker'].unique():
-            close_col = f"Close_{ticker}"
-            if close_col in merged_df.columns:
-                logging.info(f"Processing ticker {ticker}.")
-                shifted_values = merged_df.loc[merged_df['Ticker'] == ticker, close_col].shift(-1)
-
-                # Assign to new column
-                merged_df.loc[merged_df['Ticker'] == ticker, 'Close_Ticker_Shifted'] = shifted_values
-                merged_df.loc[merged_df['Ticker'] == ticker, 'Target'] = (
-                    merged_df.loc[merged_df['Ticker'] == ticker, 'Close_Ticker_Shifted'] >
-                    merged_df.loc[merged_df['Ticker'] == ticker, close_col]
-                ).astype(int)
-                logging.info(f"Computed Target column for ticker {ticker}.")
-
-        # Convert shifted close prices to numeric type
-        merged_df['Close_Ticker_Shifted'] = pd.to_numeric(merged_df['Close_Ticker_Shifted'])
-        logging.info("Converted Close_Ticker_Shifted column to numeric type.")
-
-        logging.info("Stock data processing completed successfully.")
+        logging.info(f"Stock data processing completed successfully. Peak memory: {peak_memory_mb():.1f} MB.")
         return merged_df
 
     except Exception as e:
         logging.error(f"Error during stock data processing: {e}", exc_info=True)
         raise
 
+def process_stock_data(data_file=DATA_FILE, tickers=SELECTED_TICKERS, chunksize=DEFAULT_CHUNKSIZE, workers=1, layout="wide", features=False, horizons=()):
+    logging.info("Starting stock data processing.")
+
+    # Stock data downloaded, filtered to the selected tickers while streaming:
+    logging.info(f"Loading stock data for tickers: {tickers}.")
+    tickers_df = load_price_data(data_file, tickers, chunksize)
+    logging.info(f"Filtered data contains {tickers_df.shape[0]} rows.")
+
+    return transform_stock_data(tickers_df, workers, layout, features, horizons)
+
+def load_watermark(output_dir):
+    """Return the saved per-ticker watermarks, or None if there are none."""
+    watermark_file = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(watermark_file):
+        return None
+    with open(watermark_file) as f:
+        return json.load(f)
+
+def transform_options(layout="wide", features=False, horizons=()):
+    """The options that shape the processed dataset's columns, as saved with the watermark."""
+    return {"layout": layout, "features": bool(features), "horizons": sorted(int(h) for h in horizons)}
+
+def save_watermark(output_dir, raw_through, processed_df, options):
+    """Persist the last raw and last processed Date of every ticker, and the transform options.
+
+    raw_through (by Ticker) is the newest row in the bulk file; processed_through is the
+    newest row in the processed dataset (raw_through minus the trimmed rows), or None for a
+    ticker with too few rows to have any processed yet.
+    """
+    processed_through = processed_df.groupby("Ticker", observed=True)["Date"].max().dt.strftime(DATE_FORMAT)
+    watermark = {
+        "options": options,
+        "tickers": {
+            ticker: {"raw_through": raw_through[ticker], "processed_through": processed_through.get(ticker)}
+            for ticker in raw_through.index
+        },
+    }
+
+    # Write to a temporary file first so a crash never leaves a partial watermark behind
+    watermark_file = os.path.join(output_dir, WATERMARK_FILE)
+    with open(watermark_file + ".tmp", "w") as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(watermark_file + ".tmp", watermark_file)
+    logging.info(f"Saved watermarks for {len(watermark['tickers'])} tickers to {watermark_file}.")
+
+def run_full(data_file, tickers, chunksize, output_dir, export_csv=False, workers=1, layout="wide", features=False, horizons=()):
+    """Process the full price history and overwrite the processed dataset. Returns the processed frame."""
+    logging.info("Running full ETL.")
+    tickers_df = load_price_data(data_file, tickers, chunksize)
+    final_df = transform_stock_data(tickers_df, workers, layout, features, horizons)
+    write_processed_data(final_df, output_dir, export_csv=export_csv)
+    raw_through = tickers_df.groupby("Ticker", observed=True)["Date"].max().dt.strftime(DATE_FORMAT)
+    save_watermark(output_dir, raw_through, final_df, transform_options(layout, features, horizons))
+    return final_df
+
+def run_incremental(data_file, tickers, chunksize, output_dir, export_csv=False, workers=1, layout="wide", features=False, horizons=()):
+    """Process only the rows past the saved watermarks and splice them into the processed dataset.
+
+    Rows from the oldest processed_through date of the tickers with new raw rows onwards are
+    recomputed: they include each such ticker's last processed row, whose Target was missing
+    its next close, and the trimmed rows that now fall outside the last-30 window. Older rows
+    are kept as they are, so a ticker that stopped trading does not hold the cutoff back.
+    With features=True, enough earlier rows are read for the indicators' lookback windows.
+    Falls back to a full run when there is no previous state, the file's tickers (of the
+    selection, or all of them with tickers=None) differ from the watermarked ones, or the
+    dataset was built with other layout, features or horizons options (its columns would not
+    match the recomputed tail). Returns the processed frame, or None if there was nothing new
+    to process.
+    """
+    output_file = os.path.join(output_dir, PROCESSED_FILE)
+    options = transform_options(layout, features, horizons)
+    saved = load_watermark(output_dir)
+    if saved is None or not os.path.exists(output_file) or "tickers" not in saved:
+        logging.info("No usable watermark, falling back to a full run.")
+        return run_full(data_file, tickers, chunksize, output_dir, export_csv, workers, layout, features, horizons)
+    if saved["options"] != options:
+        logging.info(f"Processed dataset was built with {saved['options']}, not {options}; falling back to a full run.")
+        return run_full(data_file, tickers, chunksize, output_dir, export_csv, workers, layout, features, horizons)
+
+    # The universe is whatever the file holds for the selected tickers (all of them with tickers=None)
+    watermark = saved["tickers"]
+    raw_through = load_raw_through(data_file, tickers, chunksize)
+    file_tickers = set(raw_through.index)
+    if file_tickers != set(watermark):
+        logging.info(
+            f"Tickers changed since the last run ({len(file_tickers - set(watermark))} added, "
+            f"{len(set(watermark) - file_tickers)} removed), falling back to a full run."
+        )
+        return run_full(data_file, tickers, chunksize, output_dir, export_csv, workers, layout, features, horizons)
+
+    advanced = [ticker for ticker, marks in watermark.items() if raw_through[ticker] > marks["raw_through"]]
+    if not advanced:
+        logging.info("No new rows since the last run, processed dataset is up to date.")
+        return None
+    if any(watermark[ticker]["processed_through"] is None for ticker in advanced):
+        logging.info("Some tickers with new rows have no processed rows to resume from yet, falling back to a full run.")
+        return run_full(data_file, tickers, chunksize, output_dir, export_csv, workers, layout, features, horizons)
+
+    # Tickers without new rows keep their processed rows, however far back their last date is
+    cutoff = min(watermark[ticker]["processed_through"] for ticker in advanced)
+    logging.info(f"Running incremental ETL from {cutoff} for {len(advanced)} of {len(watermark)} tickers with new rows.")
+    since = cutoff
+    if features:
+        # Two calendar days per trading day (plus holidays) covers the indicators' lookback
+        since = (pd.Timestamp(cutoff) - timedelta(days=2 * max_lookback() + 10)).strftime(DATE_FORMAT)
+    tickers_df = load_price_data(data_file, tickers, chunksize, since=since)
+
+    # Tickers absent from the tail (no rows since the cutoff) still need their category in the history
+    ticker_type = ticker_dtype(watermark if tickers is None else tickers)
+    tail_df = transform_stock_data(tickers_df, workers, layout, features, horizons)
+    tail_df = tail_df[tail_df["Date"] >= pd.Timestamp(cutoff)].astype({"Ticker": ticker_type})
+
+    # Keep the untouched history and append the recomputed tail
+    history = pq.read_table(output_file, filters=[("Date", "<", pd.Timestamp(cutoff))])
+    logging.info(f"Kept {history.num_rows} processed rows before {cutoff}, recomputed {tail_df.shape[0]} rows.")
+    final_df = pd.concat([history.to_pandas().astype({"Ticker": ticker_type}), tail_df], ignore_index=True)
+    final_df = final_df.sort_values(by=["Ticker", "Date"], ignore_index=True)
+
+    write_processed_data(final_df, output_dir, export_csv=export_csv)
+    save_watermark(output_dir, raw_through, final_df, options)
+    return final_df
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL for the SimFin daily share prices bulk file.")
+    parser.add_argument("--input", default=DATA_FILE, help="SimFin us-shareprices-daily bulk file (or a synthetic one).")
+    parser.add_argument("--tickers", default=",".join(SELECTED_TICKERS), help="Comma-separated tickers to keep, or 'all' for every ticker in the file.")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows parsed per chunk while streaming the input file.")
+    parser.add_argument("--csv", action="store_true", help="Also export the processed data as CSV.")
+    parser.add_argument("--incremental", action="store_true", help="Only process rows newer than the saved per-ticker watermarks.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the per-ticker stage (1 runs in-process).")
+    parser.add_argument("--features", action="store_true", help="Add technical indicators (returns, volatility, RSI, ATR, volume z-score, lags) per ticker.")
+    parser.add_argument("--horizons", default="", help=f"Comma-separated forward horizons in days for extra return labels, e.g. {','.join(map(str, LABEL_HORIZONS))}.")
+    parser.add_argument("--layout", choices=["wide", "long"], default="wide", help="Wide pivoted features, or long prices for the feature store.")
+    args = parser.parse_args()
+
     try:
         logging.info("Script execution started.")
-        final_df = process_stock_data()
-        
+
         # Save processed data in ./output/
-        output_file = os.path.join(output_dir, "processed_stock_data.csv")
-        final_df.to_csv(output_file, index=False)
+        run = run_incremental if args.incremental else run_full
+        output_file = os.path.join(output_dir, PROCESSED_FILE)
+        tickers = None if args.tickers == "all" else args.tickers.split(",")
+        horizons = [int(h) for h in args.horizons.split(",") if h]
+        run(args.input, tickers, args.chunksize, output_dir, export_csv=args.csv, workers=args.workers, layout=args.layout, features=args.features, horizons=horizons)
         logging.info(f"Processed stock data saved successfully at {output_file}.")
 
     except Exception as e:
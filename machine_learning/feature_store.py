@@ -0,0 +1,143 @@
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+from scipy import sparse
+from numpy.lib.stride_tricks import sliding_window_view
+from schema import FLOAT_DTYPE
+
+# Price fields gathered across tickers, in the same order as the ETL's wide pivot
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Adj. Close", "Volume"]
+
+def to_csr(values):
+    """CSR matrix of a 2-D array holding only its non-NaN cells. Zeros stay as stored values."""
+    values = np.asarray(values)
+    rows, cols = np.nonzero(~np.isnan(values))
+    return sparse.csr_matrix((values[rows, cols], (rows, cols)), shape=values.shape)
+
+class FeatureStore:
+    """
+    Keeps share prices in long form and materializes the cross-ticker feature view on demand.
+
+    Prices are stored once per (Date, Ticker) in a dates x tickers x fields grid, so memory
+    grows linearly with the universe. The wide features of a row (e.g. Close_AAPL) are
+    gathered from the grid by the row's date for a peer set of tickers, which reproduces the
+    ETL's pivot+merge without ever holding N x 6N cells per date.
+    """
+
+    def __init__(self, prices, fields=PRICE_FIELDS):
+        """
+        Parameters:
+            prices (pd.DataFrame): Long price frame with Date, Ticker and the price fields.
+            fields (list): The price fields available to the feature view.
+        """
+        self.fields = list(fields)
+        self.dates, date_idx = np.unique(prices["Date"].to_numpy(), return_inverse=True)
+        self.tickers, ticker_idx = np.unique(prices["Ticker"].to_numpy(), return_inverse=True)
+
+        self._grid = np.full((len(self.dates), len(self.tickers), len(self.fields)), np.nan, dtype=FLOAT_DTYPE)
+        self._grid[date_idx, ticker_idx] = prices[self.fields].to_numpy(dtype=FLOAT_DTYPE)
+
+    @classmethod
+    def from_parquet(cls, data_file, fields=PRICE_FIELDS):
+        """Build the store from a long-format Parquet file, reading only the price columns."""
+        columns = ["Date", "Ticker"] + list(fields)
+        prices = pq.read_table(data_file, columns=columns, memory_map=True).to_pandas()
+        return cls(prices, fields)
+
+    def feature_names(self, peers=None):
+        """Return the wide feature names for a peer set, e.g. Open_AAPL, ..., Volume_ODFL."""
+        peers = self.tickers if peers is None else peers
+        return [f"{field}_{peer}" for field in self.fields for peer in peers]
+
+    def _peer_index(self, peers):
+        peers = self.tickers if peers is None else np.asarray(peers)
+        peer_idx = np.searchsorted(self.tickers, peers)
+        if (peer_idx >= len(self.tickers)).any() or (self.tickers[peer_idx] != peers).any():
+            raise ValueError(f"Unknown peers requested: {sorted(set(peers) - set(self.tickers))}")
+        return peers, peer_idx
+
+    def _date_index(self, frame):
+        dates = frame["Date"].to_numpy()
+        date_idx = np.searchsorted(self.dates, dates)
+        if (date_idx >= len(self.dates)).any() or (self.dates[date_idx] != dates).any():
+            raise ValueError("Frame contains dates that are not in the feature store.")
+        return date_idx
+
+    def view(self, frame, peers=None):
+        """
+        Gather the cross-ticker features for every row of frame.
+
+        Parameters:
+            frame (pd.DataFrame): Rows to build features for. Must have a Date column.
+            peers (list): Tickers whose prices are gathered. Defaults to the whole universe.
+
+        Returns:
+            pd.DataFrame: One column per field and peer, aligned with frame's index.
+        """
+        peers, peer_idx = self._peer_index(peers)
+        date_idx = self._date_index(frame)
+
+        # (rows, peers, fields) -> (rows, fields, peers) to keep the pivot's column order
+        block = self._grid[date_idx[:, None], peer_idx[None, :]].transpose(0, 2, 1).reshape(len(frame), -1)
+        return pd.DataFrame(block, columns=self.feature_names(peers), index=frame.index)
+
+    def iter_views(self, frame, batch_size, peers=None):
+        """Yield (rows, features) batches so the full wide view never has to exist at once."""
+        for start in range(0, len(frame), batch_size):
+            rows = frame.iloc[start:start + batch_size]
+            yield rows, self.view(rows, peers)
+
+    def date_matrix(self, peers=None):
+        """The cross-ticker features of every date as a (dates x fields*peers) CSR matrix of observed prices."""
+        peers, peer_idx = self._peer_index(peers)
+        return to_csr(self._grid[:, peer_idx].transpose(0, 2, 1).reshape(len(self.dates), -1))
+
+    def sparse_view(self, frame, peers=None):
+        """
+        view() as a CSR matrix: prices of peers without a row on a date (not listed yet,
+        delisted or missing) are absent instead of NaN, so memory follows the observed values.
+        Columns are in feature_names(peers) order.
+        """
+        return self.date_matrix(peers)[self._date_index(frame)]
+
+    def windows(self, lags):
+        """
+        Lookback windows over the grid as a strided view, without copying it.
+
+        Returns an array of shape (dates - lags + 1, tickers, fields, lags) where
+        windows(lags)[i, ..., k] holds the prices of date i + lags - 1 - k, i.e. k days back.
+        """
+        return sliding_window_view(self._grid, lags, axis=0)[..., ::-1]
+
+    def lagged_feature_names(self, lags, peers=None):
+        """Names of the flattened lagged features, e.g. Close_AAPL_Lag0 (same day), Close_AAPL_Lag1, ..."""
+        return [f"{name}_Lag{k}" for k in range(lags) for name in self.feature_names(peers)]
+
+    def lagged_view(self, frame, lags, peers=None):
+        """
+        Gather the last `lags` days of cross-ticker features for every row of frame, flattened
+        to one column per (lag, field, peer). Only the rows of frame are copied out of the
+        strided windows; lags reaching before the first date are NaN.
+        """
+        peers, peer_idx = self._peer_index(peers)
+        date_idx = self._date_index(frame)
+        window_idx = date_idx - (lags - 1)
+
+        # (rows, peers, fields, lags) -> (rows, lags, fields, peers), flattened lag-major
+        block = self.windows(lags)[np.maximum(window_idx, 0)[:, None], peer_idx[None, :]]
+        block = block.transpose(0, 3, 2, 1).reshape(len(frame), lags, -1)
+
+        # Rows in the first lags - 1 dates have no full window; fill the lags they do have
+        for row in np.flatnonzero(window_idx < 0):
+            block[row] = np.nan
+            for k in range(date_idx[row] + 1):
+                block[row, k] = self._grid[date_idx[row] - k, peer_idx].T.ravel()
+
+        block = block.reshape(len(frame), -1)
+        return pd.DataFrame(block, columns=self.lagged_feature_names(lags, peers), index=frame.index)
+
+    def iter_lagged_views(self, frame, lags, batch_size, peers=None):
+        """Yield (rows, lagged features) batches, so the full (rows x lags x features) tensor never exists."""
+        for start in range(0, len(frame), batch_size):
+            rows = frame.iloc[start:start + batch_size]
+            yield rows, self.lagged_view(rows, lags, peers)
@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+
+from schema import FLOAT_DTYPE
+
+# Indicator settings used by the ETL's --features flag
+RETURN_WINDOWS = [1, 5, 20]
+VOLATILITY_WINDOWS = [5, 20]
+RSI_WINDOW = 14
+ATR_WINDOW = 14
+VOLUME_Z_WINDOW = 20
+RETURN_LAGS = [1, 2, 3, 5]
+
+def max_lookback():
+    """Rows of history the indicators need before a row's values are complete."""
+    return max(max(RETURN_WINDOWS), max(VOLATILITY_WINDOWS) + 1, RSI_WINDOW + 1, ATR_WINDOW + 1,
+               VOLUME_Z_WINDOW, 1 + max(RETURN_LAGS))
+
+def group_positions(tickers):
+    """Position of each row within its ticker's contiguous block (0 for the first row)."""
+    codes = pd.factorize(tickers)[0]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+
+def lag(x, k, pos):
+    """x shifted down k rows within each ticker; the first k rows of a ticker are NaN."""
+    out = np.full(len(x), np.nan)
+    out[k:] = x[:-k] if k else x
+    out[pos < k] = np.nan
+    return out
+
+def group_ids(pos):
+    """Ticker block number of each row, from its positions (a new block starts wherever the position does not increase)."""
+    return np.cumsum(np.r_[True, pos[1:] <= pos[:-1]]) - 1
+
+def rolling_sums(x, windows, pos):
+    """
+    Trailing sums of x over each window, within each ticker, from one cumulative sum per ticker.
+
+    The cumulative sums restart at every ticker, so a small-valued ticker following large-valued
+    ones is not differenced out of a huge running total. Windows that would reach into the
+    previous ticker, or that contain a NaN, are NaN. Returns {window: sums}.
+    """
+    missing = np.isnan(x)
+    csum = pd.Series(np.where(missing, 0.0, x)).groupby(group_ids(pos)).cumsum().to_numpy()
+    cmissing = np.concatenate([[0], np.cumsum(missing)])
+    end = np.arange(1, len(x) + 1)
+
+    sums = {}
+    for w in windows:
+        start = np.maximum(end - w, 0)
+        # Rows whose window starts at their ticker's first row subtract nothing
+        total = csum - np.where(pos >= w, csum[np.maximum(end - 1 - w, 0)], 0.0)
+        total[(cmissing[end] - cmissing[start] > 0) | (pos < w - 1)] = np.nan
+        sums[w] = total
+    return sums
+
+def rolling_mean_std(x, windows, pos):
+    """
+    Trailing mean and sample standard deviation over each window, from two cumulative sums.
+
+    x is centred on each ticker's mean first: the variance does not change, but the sums of
+    squares stay near the variance's scale instead of cancelling between two huge numbers.
+    """
+    shift = pd.Series(x).groupby(group_ids(pos)).transform("mean").to_numpy()
+    centred = x - shift
+    s1 = rolling_sums(centred, windows, pos)
+    s2 = rolling_sums(centred * centred, windows, pos)
+    stats = {}
+    for w in windows:
+        mean = s1[w] / w
+        var = np.maximum(s2[w] - w * mean * mean, 0.0) / max(w - 1, 1)
+        stats[w] = (mean + shift, np.sqrt(var))
+    return stats
+
+def add_indicators(df):
+    """
+    Add technical indicators to a frame sorted by Ticker and Date, in place. Returns df.
+
+    Each input series is turned into one cumulative sum over the whole array, and every
+    window is a difference of two cumulative sums, so the cost is O(rows) whatever the
+    window lengths. Rows whose window reaches into another ticker get NaN.
+
+    Columns added:
+        Return_{w}: close-to-close return over w days.
+        Return_1_Lag{k}: the 1-day return k days earlier.
+        Volatility_{w}: standard deviation of daily log returns over w days.
+        RSI_{RSI_WINDOW}: relative strength index over simple averages of gains and losses.
+        ATR_{ATR_WINDOW}: average true range, as a fraction of the close.
+        Volume_Z_{VOLUME_Z_WINDOW}: z-score of the volume against its trailing window.
+    """
+    pos = group_positions(df["Ticker"])
+    close = df["Close"].to_numpy(np.float64)
+    high = df["High"].to_numpy(np.float64)
+    low = df["Low"].to_numpy(np.float64)
+    volume = df["Volume"].to_numpy(np.float64)
+    features = {}
+
+    for w in RETURN_WINDOWS:
+        features[f"Return_{w}"] = close / lag(close, w, pos) - 1
+    daily_return = close / lag(close, 1, pos) - 1
+    for k in RETURN_LAGS:
+        features[f"Return_1_Lag{k}"] = lag(daily_return, k, pos)
+
+    # Daily log returns start at the second row of each ticker, hence the shifted positions
+    log_return = np.log(close / lag(close, 1, pos))
+    for w, (_, std) in rolling_mean_std(log_return, VOLATILITY_WINDOWS, pos - 1).items():
+        features[f"Volatility_{w}"] = std
+
+    change = close - lag(close, 1, pos)
+    gains = rolling_sums(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), [RSI_WINDOW], pos - 1)[RSI_WINDOW]
+    losses = rolling_sums(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), [RSI_WINDOW], pos - 1)[RSI_WINDOW]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[f"RSI_{RSI_WINDOW}"] = np.where(gains + losses > 0, 100 * gains / (gains + losses), 50.0)
+    features[f"RSI_{RSI_WINDOW}"][np.isnan(gains) | np.isnan(losses)] = np.nan
+
+    prev_close = lag(close, 1, pos)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    true_range[np.isnan(prev_close)] = np.nan
+    features[f"ATR_{ATR_WINDOW}"] = rolling_sums(true_range, [ATR_WINDOW], pos - 1)[ATR_WINDOW] / ATR_WINDOW / close
+
+    mean, std = rolling_mean_std(volume, [VOLUME_Z_WINDOW], pos)[VOLUME_Z_WINDOW]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[f"Volume_Z_{VOLUME_Z_WINDOW}"] = np.where(std > 0, (volume - mean) / std, 0.0)
+    features[f"Volume_Z_{VOLUME_Z_WINDOW}"][np.isnan(mean)] = np.nan
+
+    for name, values in features.items():
+        df[name] = values.astype(FLOAT_DTYPE)
+    return df
@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+
+# Digests of large files are reused while their size and modification time are unchanged
+DIGEST_CACHE_FILE = os.path.join("./output", ".stage_cache", "digests.json")
+
+def load_digest_cache(cache_file=DIGEST_CACHE_FILE):
+    """Return the saved file digests, keyed by absolute path."""
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+def save_digest_cache(digest_cache, cache_file=DIGEST_CACHE_FILE):
+    """Persist the file digests atomically."""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file + ".tmp", "w") as f:
+        json.dump(digest_cache, f, indent=2)
+    os.replace(cache_file + ".tmp", cache_file)
+
+def file_digest(path, digest_cache=None):
+    """Return the SHA-256 of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cached = digest_cache.get(key) if digest_cache is not None else None
+    if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["sha256"]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    if digest_cache is not None:
+        digest_cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    return digest
+
+def fingerprint(files, config=None, digest_cache=None):
+    """Hash the contents of files together with a JSON-serializable config."""
+    payload = {
+        "files": {path: file_digest(path, digest_cache) for path in sorted(files)},
+        "config": config,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
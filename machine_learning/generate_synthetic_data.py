@@ -0,0 +1,125 @@
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import os
+import zipfile
+
+# Ensure required directories exist
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging
+log_file = os.path.join(log_dir, "generate_synthetic_data.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+
+# Same layout as SimFin's us-shareprices-daily bulk download
+SIMFIN_COLUMNS = ["Ticker", "SimFinId", "Date", "Open", "High", "Low", "Close", "Adj. Close", "Volume", "Dividend", "Shares Outstanding"]
+CSV_NAME = "us-shareprices-daily.csv"
+DEFAULT_OUTPUT = "../data/synthetic/us-shareprices-daily.zip"
+
+# The real training universe comes first so the default ETL tickers exist in every synthetic file
+BASE_TICKERS = ["AAPL", "MSFT", "BRO", "FAST", "ODFL"]
+
+def make_tickers(n_tickers):
+    """Return n_tickers unique ticker symbols, starting with the training universe."""
+    synthetic = [f"SYN{i:05d}" for i in range(max(n_tickers - len(BASE_TICKERS), 0))]
+    return (BASE_TICKERS + synthetic)[:n_tickers]
+
+def simulate_ticker_batch(tickers, first_id, dates, missing_rate, rng):
+    """Simulate daily prices for a batch of tickers as a SimFin-formatted frame."""
+    n_tickers, n_days = len(tickers), len(dates)
+
+    # Geometric random walk per ticker with its own drift and volatility
+    drift = rng.normal(0.0003, 0.0004, (n_tickers, 1))
+    vol = rng.uniform(0.008, 0.03, (n_tickers, 1))
+    start_price = rng.lognormal(3.5, 1.0, (n_tickers, 1))
+    close = start_price * np.exp(np.cumsum(drift + vol * rng.standard_normal((n_tickers, n_days)), axis=1))
+
+    prev_close = np.concatenate([start_price, close[:, :-1]], axis=1)
+    open_ = prev_close * (1 + vol / 3 * rng.standard_normal((n_tickers, n_days)))
+    high = np.maximum(open_, close) * (1 + np.abs(vol / 2 * rng.standard_normal((n_tickers, n_days))))
+    low = np.minimum(open_, close) * (1 - np.abs(vol / 2 * rng.standard_normal((n_tickers, n_days))))
+
+    # Roughly quarterly dividends; each one adjusts every earlier close down
+    dividend = np.where(rng.random((n_tickers, n_days)) < 1 / 63, np.round(close * rng.uniform(0.002, 0.01), 2), np.nan)
+    factor = 1 - np.nan_to_num(dividend / close)
+    factor_after = np.cumprod(factor[:, ::-1], axis=1)[:, ::-1] / factor
+    adj_close = close * factor_after
+
+    volume = np.round(rng.lognormal(14, 1.2, (n_tickers, 1)) * rng.lognormal(0, 0.4, (n_tickers, n_days)))
+    shares = np.round(rng.lognormal(19.5, 1.2, (n_tickers, 1)) * np.ones((1, n_days)), -3)
+
+    frame = pd.DataFrame({
+        "Ticker": np.repeat(tickers, n_days),
+        "SimFinId": np.repeat(np.arange(first_id, first_id + n_tickers), n_days),
+        "Date": np.tile(dates, n_tickers),
+        "Open": np.round(open_, 2).ravel(),
+        "High": np.round(high, 2).ravel(),
+        "Low": np.round(low, 2).ravel(),
+        "Close": np.round(close, 2).ravel(),
+        "Adj. Close": np.round(adj_close, 2).ravel(),
+        "Volume": volume.ravel().astype(np.int64),
+        "Dividend": dividend.ravel(),
+        "Shares Outstanding": shares.ravel(),
+    })
+
+    # Drop a fraction of the ticker-days to mimic missing data
+    if missing_rate > 0:
+        frame = frame[rng.random(len(frame)) >= missing_rate]
+    return frame
+
+def generate_share_prices(output_file, n_tickers, start, end, missing_rate=0.01, seed=42, batch_size=250):
+    """
+    Write a synthetic file in the format of SimFin's us-shareprices-daily.zip.
+
+    Parameters:
+        output_file (str): Path of the ZIP file to write.
+        n_tickers (int): Number of tickers in the universe.
+        start (str): First trading day (YYYY-MM-DD).
+        end (str): Last trading day (YYYY-MM-DD).
+        missing_rate (float): Fraction of ticker-days dropped at random.
+        seed (int): Random seed; the same arguments always produce the same file.
+        batch_size (int): Tickers simulated and written at a time, bounding memory use.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, end).strftime("%Y-%m-%d").to_numpy()
+    tickers = make_tickers(n_tickers)
+    logging.info(f"Generating {n_tickers} tickers over {len(dates)} trading days into {output_file} (seed {seed}).")
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    rows = 0
+    with zipfile.ZipFile(output_file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(CSV_NAME, "w", force_zip64=True) as f:
+            f.write((";".join(SIMFIN_COLUMNS) + "\n").encode())
+            for first in range(0, n_tickers, batch_size):
+                batch = simulate_ticker_batch(tickers[first:first + batch_size], first + 1, dates, missing_rate, rng)
+                f.write(batch.to_csv(sep=";", index=False, header=False).encode())
+                rows += len(batch)
+
+    logging.info(f"Wrote {rows} rows to {output_file} ({os.path.getsize(output_file) / 1e6:.1f} MB).")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SimFin us-shareprices-daily.zip for benchmarks.")
+    parser.add_argument("--tickers", type=int, default=500, help="Number of tickers.")
+    parser.add_argument("--start", default="2015-01-01", help="First trading day (YYYY-MM-DD).")
+    parser.add_argument("--end", default="2024-12-31", help="Last trading day (YYYY-MM-DD).")
+    parser.add_argument("--missing-rate", type=float, default=0.01, help="Fraction of ticker-days dropped at random.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Path of the ZIP file to write.")
+    args = parser.parse_args()
+
+    try:
+        rows = generate_share_prices(args.output, args.tickers, args.start, args.end, args.missing_rate, args.seed)
+        print(f"Synthetic share prices ({rows} rows) saved at {args.output}.")
+    except Exception as e:
+        logging.critical("Synthetic data generation failed.", exc_info=True)
+        raise
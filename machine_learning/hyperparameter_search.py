@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import xgboost as xgb
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from model_training import DATA_FILE, NUM_ROUNDS, XGB_PARAMS, load_data, output_dir, split_dmatrices
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing model_training already configured its own log file)
+log_file = os.path.join(log_dir, "hyperparameter_search.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
+)
+
+RESULTS_FILE = os.path.join(output_dir, "hyperparameter_search.csv")
+
+# Sampling distribution of each searched parameter; the rest of XGB_PARAMS stays fixed
+SEARCH_SPACE = {
+    "eta": ("log_uniform", 0.005, 0.3),
+    "max_depth": ("int", 2, 10),
+    "subsample": ("uniform", 0.5, 1.0),
+    "colsample_bytree": ("uniform", 0.5, 1.0),
+    "gamma": ("uniform", 0.0, 10.0),
+    "alpha": ("log_uniform", 0.01, 10.0),
+    "lambda": ("log_uniform", 0.1, 20.0),
+    "min_child_weight": ("log_uniform", 1.0, 50.0),
+}
+
+def sample_configs(n_configs, seed=42):
+    """Draw n_configs parameter sets from SEARCH_SPACE."""
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n_configs):
+        config = {}
+        for name, (kind, low, high) in SEARCH_SPACE.items():
+            if kind == "int":
+                config[name] = int(rng.integers(low, high + 1))
+            elif kind == "log_uniform":
+                config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+            else:
+                config[name] = float(rng.uniform(low, high))
+        configs.append(config)
+    return configs
+
+def rung_rounds(min_rounds, max_rounds, reduction):
+    """Cumulative boosting rounds at each rung: min_rounds, min_rounds * reduction, ... up to max_rounds."""
+    rounds = [min_rounds]
+    while rounds[-1] * reduction < max_rounds:
+        rounds.append(rounds[-1] * reduction)
+    if rounds[-1] < max_rounds:
+        rounds.append(max_rounds)
+    return rounds
+
+# Each worker builds the DMatrix pair once and reuses it for every config it trains
+_worker = {}
+
+def _init_worker(features, target, nthread):
+    _worker["dtrain"], _worker["dtest"] = split_dmatrices(features, target, nthread=nthread)
+    _worker["nthread"] = nthread
+
+def train_config(config_id, config, rounds, raw_model=None):
+    """
+    Boost a config for `rounds` more rounds in a worker, continuing from raw_model if given.
+
+    Returns (config_id, eval log loss, raw model bytes) so the booster can be continued at
+    the next rung by whichever worker picks it up.
+    """
+    params = dict(XGB_PARAMS, **config, nthread=_worker["nthread"])
+    booster = xgb.Booster(model_file=bytearray(raw_model)) if raw_model is not None else None
+
+    evals_result = {}
+    booster = xgb.train(params, _worker["dtrain"], rounds, evals=[(_worker["dtest"], "eval")],
+                        evals_result=evals_result, xgb_model=booster, verbose_eval=False)
+    return config_id, evals_result["eval"]["logloss"][-1], bytes(booster.save_raw("ubj"))
+
+def successive_halving(features, target, n_configs=27, min_rounds=20, max_rounds=NUM_ROUNDS, reduction=3, workers=None, seed=42):
+    """
+    Search the XGBoost parameters with successive halving.
+
+    Every config is trained for min_rounds; only the best 1/reduction by eval log loss are
+    continued to the next rung, and so on until max_rounds. Surviving boosters are continued
+    rather than retrained, so the whole search costs a few full trainings instead of one
+    per config.
+
+    Returns a DataFrame with one row per config, ranked by its last eval log loss.
+    """
+    logging.info(f"Starting successive halving over {n_configs} configs ({min_rounds} to {max_rounds} rounds, reduction {reduction}).")
+
+    try:
+        configs = sample_configs(n_configs, seed)
+        workers = min(workers or os.cpu_count(), n_configs)
+        nthread = max(1, os.cpu_count() // workers)
+        rungs = rung_rounds(min_rounds, max_rounds, reduction)
+
+        records = {i: {"config_id": i, **config, "rounds": 0, "rung": 0, "logloss": np.nan} for i, config in enumerate(configs)}
+        models = {i: None for i in range(n_configs)}
+        alive = list(range(n_configs))
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features, target, nthread)) as executor:
+            for rung, total_rounds in enumerate(rungs):
+                extra_rounds = total_rounds - (rungs[rung - 1] if rung else 0)
+                futures = [executor.submit(train_config, i, configs[i], extra_rounds, models[i]) for i in alive]
+                for future in futures:
+                    config_id, logloss, models[config_id] = future.result()
+                    records[config_id].update(rounds=total_rounds, rung=rung, logloss=logloss)
+
+                alive.sort(key=lambda i: records[i]["logloss"])
+                logging.info(
+                    f"Rung {rung}: {len(alive)} configs at {total_rounds} rounds, "
+                    f"best log loss {records[alive[0]]['logloss']:.5f} (config {alive[0]})."
+                )
+
+                # Free the boosters of pruned configs
+                keep = max(1, len(alive) // reduction)
+                for i in alive[keep:]:
+                    models[i] = None
+                alive = alive[:keep]
+
+        results = pd.DataFrame(records.values()).sort_values(["rung", "logloss"], ascending=[False, True]).reset_index(drop=True)
+        trained_rounds = int(sum(results["rounds"]))
+        logging.info(
+            f"Search finished in {time.perf_counter() - started:.2f}s with {trained_rounds} boosting rounds "
+            f"({trained_rounds / (n_configs * max_rounds):.0%} of training every config fully)."
+        )
+        return results
+
+    except Exception as e:
+        logging.error(f"Error during hyperparameter search: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the XGBoost parameters with successive halving.")
+    parser.add_argument("--input", default=DATA_FILE, help="Processed data from the ETL script (Parquet or CSV).")
+    parser.add_argument("--configs", type=int, default=27, help="Number of parameter sets sampled.")
+    parser.add_argument("--min-rounds", type=int, default=20, help="Boosting rounds every config gets in the first rung.")
+    parser.add_argument("--max-rounds", type=int, default=NUM_ROUNDS, help="Boosting rounds of the configs reaching the last rung.")
+    parser.add_argument("--reduction", type=int, default=3, help="Keep the best 1/reduction configs at each rung.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the sampled parameter sets.")
+    parser.add_argument("--output", default=RESULTS_FILE, help="CSV file for the ranked results.")
+    args = parser.parse_args()
+
+    logging.info("Hyperparameter search started.")
+
+    try:
+        features, target = load_data(args.input)
+        results = successive_halving(features, target, args.configs, args.min_rounds, args.max_rounds,
+                                     args.reduction, args.workers, args.seed)
+        results.to_csv(args.output, index=False)
+        logging.info(f"Ranked results saved at {args.output}.")
+        print(results.head(10).to_string(index=False))
+
+    except Exception as e:
+        logging.critical("Hyperparameter search failed.", exc_info=True)
+        raise
@@ -1,9 +1,15 @@
 import os
+import argparse
+import json
 import subprocess
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from fingerprint import fingerprint, file_digest, load_digest_cache, save_digest_cache
 
 # Ensure logging directory exists
 log_dir = "./logging"
+cache_dir = os.path.join("./output", ".stage_cache")
 os.makedirs(log_dir, exist_ok=True)
 
 # Configure logging
@@ -14,30 +20,188 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-def run_script(script_name):
+def run_etl(upstream, args):
+    """In-process ETL stage. Returns the processed frame for downstream stages."""
+    import etl
+    return etl.run_full(etl.DATA_FILE, etl.SELECTED_TICKERS, etl.DEFAULT_CHUNKSIZE, etl.output_dir)
+
+def run_model_training(upstream, args):
+    """In-process training stage, fed by the ETL frame in memory (or its artifact if the ETL was cached)."""
+    import model_training
+    processed_df = upstream["etl"]
+    if processed_df is None:
+        features, target = model_training.load_data(model_training.DATA_FILE)
+        dates = model_training.load_dates(model_training.DATA_FILE)
+        labelled = model_training.load_labelled(model_training.DATA_FILE)
+    else:
+        features, target = model_training.features_from_frame(processed_df)
+        dates = processed_df["Date"]
+        labelled = processed_df["Close_Ticker_Shifted"].notna()
+    if "--update" in args:
+        return model_training.update_xgb(features, target, dates, labelled)
+    return model_training.full_retrain(features, target, dates, labelled)
+
+def run_model_registry(upstream, args):
+    """
+    Registry stage: register the saved model, activate it and publish it to the app. Always a
+    subprocess, since the registry script configures its own log file on import.
+    """
+    run_script("model_registry.py", args)
+
+# Pipeline stages as a DAG: a stage starts once all of its deps have finished, and stages
+# without a dependency between them run concurrently. A stage's fingerprint covers its input
+# files, its code (which holds the tickers and XGBoost parameters) and its arguments, so a
+# change to any of them invalidates the stage and, through its outputs, every stage after it.
+STAGES = {
+    "etl": {
+        "script": "etl.py",
+        "run": run_etl,
+        "deps": [],
+        "args": [],
+        "inputs": ["../data/us-shareprices-daily.zip"],
+        "code": ["etl.py", "schema.py", "feature_store.py", "features.py"],
+        "outputs": ["output/processed_stock_data.parquet"],
+    },
+    "model_training": {
+        "script": "model_training.py",
+        "run": run_model_training,
+        "deps": ["etl"],
+        "args": [],
+        "inputs": ["output/processed_stock_data.parquet"],
+        "code": ["model_training.py", "schema.py", "feature_store.py"],
+        "outputs": ["output/xgb.joblib", "output/xgb_metadata.json"],
+    },
+    "model_registry": {
+        "script": "model_registry.py",
+        "run": run_model_registry,
+        "deps": ["model_training"],
+        "args": ["register", "--publish"],
+        "inputs": ["output/xgb.joblib", "output/xgb_metadata.json"],
+        "code": ["model_registry.py"],
+        "outputs": ["output/registry/ACTIVE"],
+    },
+}
+
+def run_script(script_name, args=()):
     """Runs a Python script and logs the output."""
     try:
         logging.info(f"Starting execution of {script_name}.")
-        result = subprocess.run(["python", script_name], capture_output=True, text=True, check=True)
+        result = subprocess.run(["python", script_name, *args], capture_output=True, text=True, check=True)
         logging.info(f"Execution of {script_name} completed successfully.")
         logging.info(f"Output:\n{result.stdout}")
     except subprocess.CalledProcessError as e:
         logging.error(f"Error while executing {script_name}: {e.stderr}", exc_info=True)
         raise
 
+def stage_fingerprint(stage, digest_cache):
+    """Fingerprint of a stage's inputs, code and arguments."""
+    return fingerprint(stage["inputs"] + stage["code"], config={"args": stage["args"]}, digest_cache=digest_cache)
+
+def manifest_path(name):
+    return os.path.join(cache_dir, f"{name}.json")
+
+def is_cached(name, key, digest_cache):
+    """True if the last successful run had the same fingerprint and its outputs are unchanged."""
+    if not os.path.exists(manifest_path(name)):
+        return False
+    with open(manifest_path(name)) as f:
+        manifest = json.load(f)
+    return manifest["fingerprint"] == key and all(
+        file_digest(path, digest_cache) == digest for path, digest in manifest["outputs"].items()
+    )
+
+def save_manifest(name, stage, key, digest_cache):
+    """Record the fingerprint a stage ran with and the digests of the outputs it produced."""
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = {
+        "fingerprint": key,
+        "outputs": {path: file_digest(path, digest_cache) for path in stage["outputs"]},
+    }
+    with open(manifest_path(name) + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path(name) + ".tmp", manifest_path(name))
+
+def run_stage(name, stage, upstream, digest_cache, force=False, isolated=False):
+    """
+    Run a stage unless an artifact with a matching fingerprint already exists.
+
+    Returns (result, seconds, ran). The result is what the stage's in-process function
+    returned, or None if the stage was skipped or ran as a subprocess; downstream stages
+    then read its artifact from disk.
+    """
+    started = time.time()
+    key = stage_fingerprint(stage, digest_cache)
+    if not force and is_cached(name, key, digest_cache):
+        logging.info(f"Skipping {name}: outputs are up to date (fingerprint {key[:12]}).")
+        return None, time.time() - started, False
+
+    logging.info(f"Starting stage {name} ({'subprocess' if isolated else 'in-process'}).")
+    if isolated:
+        run_script(stage["script"], stage["args"])
+        result = None
+    else:
+        result = stage["run"](upstream, stage["args"])
+
+    # Only cache runs that actually rewrote their outputs
+    if all(os.path.exists(path) and os.path.getmtime(path) >= started for path in stage["outputs"]):
+        save_manifest(name, stage, key, digest_cache)
+    else:
+        logging.warning(f"{name} did not produce all of {stage['outputs']}, not caching this run.")
+
+    elapsed = time.time() - started
+    logging.info(f"Stage {name} finished in {elapsed:.2f}s.")
+    return result, elapsed, True
+
+def run_pipeline(stages, digest_cache, force=False, isolated=False, max_workers=None):
+    """
+    Execute the stage DAG, starting every stage whose dependencies have finished.
+
+    Returns a dict of per-stage timings: {name: (seconds, ran)}.
+    """
+    results, timings = {}, {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [name for name, stage in pending.items() if all(dep in results for dep in stage["deps"])]
+            if not ready and not running:
+                raise ValueError(f"Stages {sorted(pending)} have missing or cyclic dependencies.")
+
+            for name in ready:
+                stage = pending.pop(name)
+                upstream = {dep: results[dep] for dep in stage["deps"]}
+                running[executor.submit(run_stage, name, stage, upstream, digest_cache, force, isolated)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, elapsed, ran = future.result()
+                results[name] = result
+                timings[name] = (elapsed, ran)
+                print(f"{'Ran' if ran else 'Skipped (up to date)'} {name} in {elapsed:.2f}s")
+
+    return timings
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ETL and model training pipeline.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if its outputs are up to date.")
+    parser.add_argument("--subprocess", action="store_true", help="Run each stage as a separate Python process instead of in-process.")
+    parser.add_argument("--update-model", action="store_true", help="Update the previous model with the new days instead of retraining it from scratch.")
+    parser.add_argument("--max-workers", type=int, default=None, help="Maximum number of stages running at the same time.")
+    args = parser.parse_args()
+
     logging.info("Pipeline execution started.")
+    if args.update_model:
+        STAGES["model_training"]["args"] = ["--update"]
 
     try:
-        # Step 1: Run the ETL process
-        print("Running step 1: etl.py")
-        run_script("etl.py")
-        print("Sucessfully ran step 1: etl.py")
-        # Step 2: Run the model training process
-        print("Running step 2: model_training.py")
-        run_script("model_training.py")
-        print("Sucessfully ran step 2: model_training.py")
+        digest_cache = load_digest_cache()
+        timings = run_pipeline(STAGES, digest_cache, force=args.force, isolated=args.subprocess, max_workers=args.max_workers)
+        save_digest_cache(digest_cache)
 
+        summary = ", ".join(f"{name}={elapsed:.2f}s{'' if ran else ' (cached)'}" for name, (elapsed, ran) in timings.items())
+        logging.info(f"Stage timings: {summary}.")
         logging.info("Master Pipeline execution completed successfully.")
 
     except Exception as e:
@@ -0,0 +1,160 @@
+import pandas as pd
+import xgboost as xgb
+import argparse
+import joblib
+import logging
+import os
+import time
+from sklearn.metrics import accuracy_score, log_loss
+
+from feature_store import PRICE_FIELDS
+from model_training import (
+    DATA_FILE, EARLY_STOPPING_ROUNDS, MODEL_FILE, NUM_ROUNDS, XGB_PARAMS, load_data, output_dir, split_rows,
+)
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing model_training already configured its own log file)
+log_file = os.path.join(log_dir, "model_compaction.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
+)
+
+COMPACT_MODEL_FILE = os.path.join(output_dir, "xgb_compact.joblib")
+REPORT_FILE = os.path.join(output_dir, "compaction_report.csv")
+TOP_K = [10, 25, 50, 100]
+# Largest increase in test log loss over the trimmed full model that a compact model may cost
+LOGLOSS_TOLERANCE = 0.002
+LATENCY_REPEATS = 20
+
+def rank_features(model):
+    """Feature names by total gain over all splits, most useful first. Features never split on are left out."""
+    gain = model.get_score(importance_type="total_gain")
+    return sorted(gain, key=gain.get, reverse=True)
+
+def trim_trees(model):
+    """
+    The model without the trees boosted after its best iteration (the early stopping patience).
+
+    The best iteration is only trusted when the tree count is what early stopping leaves
+    behind (best iteration + 1 + patience, or NUM_ROUNDS when it never triggered); trees
+    added later, e.g. by model_training's --update, are never cut.
+    """
+    if model.attr("best_iteration") is None:
+        return model
+    if model.num_boosted_rounds() not in (model.best_iteration + 1 + EARLY_STOPPING_ROUNDS, NUM_ROUNDS):
+        logging.info(f"Best iteration {model.best_iteration} does not match the model's {model.num_boosted_rounds()} trees; not trimming.")
+        return model
+    best_iteration, best_score = model.best_iteration, model.best_score
+    trimmed = model[: best_iteration + 1]
+    trimmed.best_iteration, trimmed.best_score = best_iteration, best_score
+    return trimmed
+
+def tickers_needed(feature_names):
+    """Tickers whose prices a model reads, from its cross-ticker feature names (e.g. Close_AAPL)."""
+    prefixes = tuple(f"{field}_" for field in PRICE_FIELDS)
+    return sorted({name.split("_", 1)[1] for name in feature_names if name.startswith(prefixes) and name.count("_") == 1})
+
+def best_time(func, repeat=LATENCY_REPEATS):
+    """Best wall time in milliseconds over repeat calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def evaluate(name, model, X_test, y_test):
+    """Accuracy, log loss, latency and size of a model on the test rows, projected onto its features."""
+    X = X_test[model.feature_names]
+    dtest = xgb.DMatrix(X)
+    probs = model.predict(dtest)
+    return {
+        "model": name,
+        "features": len(model.feature_names),
+        "tickers": len(tickers_needed(model.feature_names)),
+        "trees": model.num_boosted_rounds(),
+        "logloss": log_loss(y_test, probs, labels=[0, 1]),
+        "accuracy": accuracy_score(y_test, (probs > 0.5).astype(int)),
+        # What the app pays per call: build the DMatrix of one row, then predict
+        "row_latency_ms": best_time(lambda: model.predict(xgb.DMatrix(X.iloc[:1]))),
+        "batch_ms_per_1k_rows": best_time(lambda: model.predict(dtest)) * 1000 / len(X),
+        "size_kb": len(model.save_raw("ubj")) / 1024,
+    }
+
+def compact_model(data_file, model_path=MODEL_FILE, top_k=TOP_K, tolerance=LOGLOSS_TOLERANCE, compact_path=COMPACT_MODEL_FILE):
+    """
+    Compact a trained model for inference: trim its trees to the best iteration, then retrain
+    on the top-k features by gain for each k and keep the smallest model whose test log loss is
+    within `tolerance` of the trimmed full model's.
+
+    The candidates use the training split and early stopping of model_training, and are trimmed
+    as well. Saves the chosen model and returns (the model, DataFrame report of every candidate).
+    """
+    logging.info(f"Starting compaction of {model_path} on {data_file}.")
+
+    try:
+        features, target = load_data(data_file)
+        train_rows, test_rows = split_rows(target)
+        X_train, X_test = features.iloc[train_rows], features.iloc[test_rows]
+        y_train, y_test = target.iloc[train_rows], target.iloc[test_rows]
+
+        baseline = joblib.load(model_path)
+        trimmed = trim_trees(baseline)
+        candidates = {"full": baseline, "full_trimmed": trimmed}
+
+        # Features never split on cost nothing to drop, so "used" is the largest candidate
+        ranking = rank_features(baseline)
+        logging.info(f"{len(ranking)} of {len(baseline.feature_names)} features are used by the model; top 10 by gain: {ranking[:10]}.")
+        for k in sorted({k for k in top_k if k < len(ranking)} | {len(ranking)}):
+            columns = [col for col in features.columns if col in set(ranking[:k])]
+            dtrain = xgb.DMatrix(X_train[columns], label=y_train)
+            dtest = xgb.DMatrix(X_test[columns], label=y_test)
+            started = time.perf_counter()
+            model = xgb.train(XGB_PARAMS, dtrain, NUM_ROUNDS, evals=[(dtrain, "train"), (dtest, "eval")],
+                              early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+            logging.info(f"Top-{k} model trained in {time.perf_counter() - started:.2f}s, best iteration {model.best_iteration}.")
+            candidates["used" if k == len(ranking) else f"top{k}"] = trim_trees(model)
+
+        report = pd.DataFrame([evaluate(name, model, X_test, y_test) for name, model in candidates.items()])
+        logging.info(f"Compaction candidates:\n{report.to_string(index=False)}")
+
+        # Smallest (fewest features, then fewest trees) candidate within tolerance of the trimmed model
+        limit = report.loc[report["model"] == "full_trimmed", "logloss"].iloc[0] + tolerance
+        eligible = report[(report["logloss"] <= limit) & (report["model"] != "full")]
+        chosen = eligible.sort_values(["features", "trees"]).iloc[0]["model"]
+        report["chosen"] = report["model"] == chosen
+
+        joblib.dump(candidates[chosen], compact_path)
+        logging.info(f"Compact model {chosen} saved at {compact_path}.")
+        return candidates[chosen], report
+
+    except Exception as e:
+        logging.error(f"Error during model compaction: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trim and feature-prune the trained XGBoost model for faster inference.")
+    parser.add_argument("--input", default=DATA_FILE, help="Processed data from the ETL script (Parquet or CSV).")
+    parser.add_argument("--model", default=MODEL_FILE, help="Trained model to compact.")
+    parser.add_argument("--top-k", default=",".join(map(str, TOP_K)), help="Comma-separated feature counts to retrain on.")
+    parser.add_argument("--tolerance", type=float, default=LOGLOSS_TOLERANCE, help="Test log loss a compact model may lose against the trimmed full model.")
+    parser.add_argument("--output", default=COMPACT_MODEL_FILE, help="Where to save the compact model.")
+    args = parser.parse_args()
+
+    logging.info("Model compaction started.")
+
+    try:
+        model, report = compact_model(args.input, args.model, [int(k) for k in args.top_k.split(",")], args.tolerance, args.output)
+        report.to_csv(REPORT_FILE, index=False)
+        print(report.to_string(index=False))
+        print(f"Compact model saved at {args.output} ({len(model.feature_names)} features, {model.num_boosted_rounds()} trees).")
+
+    except Exception as e:
+        logging.critical("Model compaction failed.", exc_info=True)
+        raise
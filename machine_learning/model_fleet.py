@@ -0,0 +1,163 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+
+from model_training import DATA_FILE, column_names, fit_xgb, is_long_layout, load_data, output_dir, read_columns, split_dmatrices
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing model_training already configured its own log file)
+log_file = os.path.join(log_dir, "model_fleet.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
+)
+
+# Every training run writes a new version directory; LATEST names the newest complete one
+FLEET_DIR = os.path.join(output_dir, "fleet")
+LATEST_FILE = os.path.join(FLEET_DIR, "LATEST")
+MANIFEST_FILE = "fleet.json"
+
+def ticker_returns(data_file):
+    """Daily close-to-close returns as a dates x tickers frame, from either ETL layout."""
+    if is_long_layout(column_names(data_file)):
+        closes = read_columns(data_file, ["Date", "Ticker", "Close"]).pivot(index="Date", columns="Ticker", values="Close")
+    else:
+        close_columns = [col for col in column_names(data_file) if col.startswith("Close_") and col != "Close_Ticker_Shifted"]
+        closes = read_columns(data_file, ["Date"] + close_columns).drop_duplicates("Date").set_index("Date").sort_index()
+        closes.columns = [col[len("Close_"):] for col in closes.columns]
+    return closes.pct_change(fill_method=None)
+
+def cluster_tickers(data_file, n_clusters):
+    """
+    Group tickers whose returns move together: average-linkage clustering on 1 - correlation.
+
+    Returns {group name: [tickers]}.
+    """
+    corr = ticker_returns(data_file).corr().fillna(0)
+    distance = squareform(np.clip(1 - corr.to_numpy(), 0, None), checks=False)
+    labels = fcluster(linkage(distance, method="average"), n_clusters, criterion="maxclust")
+    groups = {}
+    for ticker, label in zip(corr.index, labels):
+        groups.setdefault(f"cluster{label}", []).append(ticker)
+    return groups
+
+# Worker processes inherit the dataset through the pool initializer instead of pickling it per task
+_fleet_data = {}
+
+def _init_worker(features, target, tickers):
+    _fleet_data.update(features=features, target=target, tickers=tickers)
+
+def train_group(name, group_tickers, model_path, nthread):
+    """Train one fleet member on the rows of its tickers. Returns its metrics."""
+    started = time.perf_counter()
+    rows = np.flatnonzero(_fleet_data["tickers"].isin(group_tickers).to_numpy())
+    features, target = _fleet_data["features"].iloc[rows], _fleet_data["target"].iloc[rows]
+
+    dtrain, dtest = split_dmatrices(features, target)
+    model = fit_xgb(dtrain, dtest, model_path, nthread=nthread)
+
+    y_test = dtest.get_label().astype(int)
+    return {
+        "group": name,
+        "tickers": ",".join(group_tickers),
+        "rows": len(rows),
+        "rounds": model.num_boosted_rounds(),
+        "accuracy": float(((model.predict(dtest) > 0.5).astype(int) == y_test).mean()),
+        "seconds": time.perf_counter() - started,
+    }
+
+def train_fleet(data_file, groups=None, workers=None, fleet_dir=FLEET_DIR):
+    """
+    Train one model per group of tickers (one group per ticker by default) in a process pool.
+
+    Each worker gets an equal share of the CPU cores as XGBoost threads. The models and a
+    fleet.json manifest mapping every ticker to its model file go to a new version directory,
+    and LATEST is switched to it only once every model is saved.
+
+    Returns (version directory, DataFrame of per-model metrics).
+    """
+    logging.info(f"Starting fleet training on {data_file}.")
+
+    try:
+        features, target = load_data(data_file)
+        tickers = read_columns(data_file, ["Ticker"])["Ticker"].astype(str).reset_index(drop=True)
+        if groups is None:
+            groups = {ticker: [ticker] for ticker in sorted(tickers.unique())}
+
+        version = datetime.now().strftime("%Y%m%d-%H%M%S")
+        version_dir = os.path.join(fleet_dir, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        workers = min(workers or os.cpu_count(), len(groups))
+        nthread = max(1, os.cpu_count() // workers)
+        logging.info(f"Training {len(groups)} models on {workers} worker processes with {nthread} threads each.")
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(features, target.reset_index(drop=True), tickers)) as executor:
+            futures = [
+                executor.submit(train_group, name, group_tickers, os.path.join(version_dir, f"{name}.joblib"), nthread)
+                for name, group_tickers in groups.items()
+            ]
+            results = []
+            for future in futures:
+                metrics = future.result()
+                logging.info(f"Fleet model {metrics['group']}: {metrics}")
+                results.append(metrics)
+
+        manifest = {
+            "version": version,
+            "data_file": data_file,
+            "groups": groups,
+            "models": {ticker: f"{name}.joblib" for name, group_tickers in groups.items() for ticker in group_tickers},
+        }
+        with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Point LATEST at the new version only now that it is complete
+        with open(LATEST_FILE + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(LATEST_FILE + ".tmp", LATEST_FILE)
+
+        results = pd.DataFrame(results)
+        logging.info(
+            f"Fleet {version} trained in {time.perf_counter() - started:.2f}s "
+            f"(sum of model times {results['seconds'].sum():.2f}s), saved at {version_dir}."
+        )
+        return version_dir, results
+
+    except Exception as e:
+        logging.error(f"Error during fleet training: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train one XGBoost model per ticker (or per cluster of tickers).")
+    parser.add_argument("--input", default=DATA_FILE, help="Processed data from the ETL script (Parquet or CSV).")
+    parser.add_argument("--clusters", type=int, default=0, help="Train one model per cluster of correlated tickers instead of per ticker.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    args = parser.parse_args()
+
+    logging.info("Fleet training started.")
+
+    try:
+        groups = cluster_tickers(args.input, args.clusters) if args.clusters else None
+        version_dir, results = train_fleet(args.input, groups, args.workers)
+        print(results.to_string(index=False))
+        print(f"Fleet saved at {version_dir}.")
+
+    except Exception as e:
+        logging.critical("Fleet training failed.", exc_info=True)
+        raise
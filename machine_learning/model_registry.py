@@ -0,0 +1,199 @@
+import xgboost as xgb
+import argparse
+import joblib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from fingerprint import file_digest
+from model_training import DATA_FILE, MODEL_FILE, load_model_metadata, output_dir
+
+# Ensure the logging directory exists
+log_dir = "./logging"
+os.makedirs(log_dir, exist_ok=True)
+
+# Configure logging (force, since importing model_training already configured its own log file)
+log_file = os.path.join(log_dir, "model_registry.log")
+logging.basicConfig(
+    filename=log_file,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
+)
+
+# Every registered model gets a version directory with model.ubj and metadata.json;
+# ACTIVE names the version in use. The app keeps a registry with the same layout.
+REGISTRY_DIR = os.path.join(output_dir, "registry")
+APP_REGISTRY_DIR = os.path.join("..", "streamlit_app", "resources", "model", "registry")
+ACTIVE_FILE = "ACTIVE"
+MODEL_FILE_NAME = "model.ubj"
+METADATA_FILE_NAME = "metadata.json"
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Registered versions, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir) if os.path.isfile(os.path.join(registry_dir, name, METADATA_FILE_NAME)))
+
+def active_version(registry_dir=REGISTRY_DIR):
+    """The version ACTIVE points at, or None."""
+    active_path = os.path.join(registry_dir, ACTIVE_FILE)
+    if not os.path.exists(active_path):
+        return None
+    with open(active_path) as f:
+        return f.read().strip()
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    """Point ACTIVE at a registered version, atomically."""
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Version {version} is not in the registry at {registry_dir}.")
+    active_path = os.path.join(registry_dir, ACTIVE_FILE)
+    with open(active_path + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(active_path + ".tmp", active_path)
+    logging.info(f"Activated model version {version} in {registry_dir}.")
+
+def load_metadata(version, registry_dir=REGISTRY_DIR):
+    """The metadata.json of a version."""
+    with open(os.path.join(registry_dir, version, METADATA_FILE_NAME)) as f:
+        return json.load(f)
+
+def load_model(version=None, registry_dir=REGISTRY_DIR):
+    """Load a version's booster (the active one by default) straight from its UBJSON file."""
+    version = version or active_version(registry_dir)
+    if version is None:
+        raise FileNotFoundError(f"No active model in the registry at {registry_dir}.")
+    return xgb.Booster(model_file=os.path.join(registry_dir, version, MODEL_FILE_NAME))
+
+def register_model(model, data_file=DATA_FILE, metrics=None, registry_dir=REGISTRY_DIR, activate_version=True):
+    """
+    Store a booster as a new registry version and (by default) make it the active one.
+
+    The version directory is written under a temporary name and renamed into place, so a
+    version either exists completely or not at all. Its metadata.json holds the feature
+    schema, the SHA-256 of the training data, the training metrics and the creation time.
+
+    Returns the version name.
+    """
+    logging.info(f"Registering a model trained on {data_file}.")
+
+    try:
+        created_at = datetime.now()
+        version = created_at.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(os.path.join(registry_dir, version)):
+            version = f"{created_at.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+
+        metadata = {
+            "version": version,
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "xgboost_version": xgb.__version__,
+            "feature_names": model.feature_names,
+            "feature_types": model.feature_types,
+            "data_file": data_file,
+            "data_sha256": file_digest(data_file),
+            "metrics": {
+                "num_trees": model.num_boosted_rounds(),
+                "best_iteration": int(model.attr("best_iteration")) if model.attr("best_iteration") else None,
+                "best_score": float(model.attr("best_score")) if model.attr("best_score") else None,
+                **(metrics or {}),
+            },
+        }
+
+        tmp_dir = os.path.join(registry_dir, f".{version}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        with open(os.path.join(tmp_dir, MODEL_FILE_NAME), "wb") as f:
+            f.write(model.save_raw("ubj"))
+        with open(os.path.join(tmp_dir, METADATA_FILE_NAME), "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_dir, os.path.join(registry_dir, version))
+        logging.info(f"Model registered as version {version} in {registry_dir}.")
+
+        if activate_version:
+            activate(version, registry_dir)
+        return version
+
+    except Exception as e:
+        logging.error(f"Error registering the model: {e}", exc_info=True)
+        raise
+
+def publish(version=None, registry_dir=REGISTRY_DIR, app_registry_dir=APP_REGISTRY_DIR):
+    """
+    Copy a version (the active one by default) into the app's registry and activate it there.
+
+    The copy is renamed into place before the app's ACTIVE pointer moves, so a running app
+    only ever sees complete versions.
+    """
+    version = version or active_version(registry_dir)
+    logging.info(f"Publishing model version {version} to {app_registry_dir}.")
+
+    try:
+        if version not in list_versions(registry_dir):
+            raise ValueError(f"Version {version} is not in the registry at {registry_dir}.")
+        target = os.path.join(app_registry_dir, version)
+        if not os.path.exists(target):
+            os.makedirs(app_registry_dir, exist_ok=True)
+            tmp_dir = os.path.join(app_registry_dir, f".{version}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            shutil.copytree(os.path.join(registry_dir, version), tmp_dir)
+            os.replace(tmp_dir, target)
+        activate(version, app_registry_dir)
+        return version
+
+    except Exception as e:
+        logging.error(f"Error publishing model version {version}: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned registry of the trained XGBoost models.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    register_parser = subparsers.add_parser("register", help="Register a trained model and make it the active version.")
+    register_parser.add_argument("--model", default=MODEL_FILE, help="Trained model (joblib, or an XGBoost .ubj/.json file).")
+    register_parser.add_argument("--input", default=DATA_FILE, help="Processed data the model was trained on.")
+    register_parser.add_argument("--no-activate", action="store_true", help="Register without switching ACTIVE to the new version.")
+    register_parser.add_argument("--publish", action="store_true", help="Also publish the new version to the Streamlit app.")
+
+    activate_parser = subparsers.add_parser("activate", help="Switch the active version (e.g. to roll back).")
+    activate_parser.add_argument("version")
+
+    publish_parser = subparsers.add_parser("publish", help="Copy a version to the Streamlit app and activate it there.")
+    publish_parser.add_argument("version", nargs="?", default=None, help="Defaults to the active version.")
+
+    subparsers.add_parser("list", help="List the registered versions.")
+    args = parser.parse_args()
+
+    logging.info(f"Model registry command {args.command} started.")
+
+    try:
+        if args.command == "register":
+            if args.model.endswith((".ubj", ".json")):
+                model = xgb.Booster(model_file=args.model)
+            else:
+                model = joblib.load(args.model)
+            # Training metadata of model_training (update count, baseline log loss, ...) when it belongs to this model
+            metrics = load_model_metadata() if args.model == MODEL_FILE else None
+            if metrics and metrics.get("num_trees") != model.num_boosted_rounds():
+                logging.warning(f"Training metadata describes a {metrics.get('num_trees')}-tree model, not this one; not recording it.")
+                metrics = None
+            version = register_model(model, args.input, metrics, activate_version=not args.no_activate)
+            if args.publish:
+                publish(version)
+            print(f"Model registered as version {version}.")
+        elif args.command == "activate":
+            activate(args.version)
+            print(f"Active model version: {args.version}.")
+        elif args.command == "publish":
+            print(f"Published model version {publish(args.version)} to {APP_REGISTRY_DIR}.")
+        else:
+            active = active_version()
+            for version in list_versions():
+                metrics = load_metadata(version)["metrics"]
+                print(f"{'*' if version == active else ' '} {version}  trees={metrics['num_trees']}  best_score={metrics['best_score']}")
+
+    except Exception as e:
+        logging.critical("Model registry command failed.", exc_info=True)
+        raise
@@ -1,13 +1,22 @@
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
 import xgboost as xgb
 import argparse
 import joblib
 import os
+import json
 import logging
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, log_loss
 from sklearn.utils.class_weight import compute_class_weight
+from scipy import sparse
+from feature_store import FeatureStore, PRICE_FIELDS, to_csr
+from fingerprint import fingerprint
+from schema import DATE_FORMAT, HORIZON_LABEL_PREFIXES, apply_schema
 
 # Ensure the required directories exist
 log_dir = "./logging"
@@ -23,33 +32,378 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-def load_data(csv_file):
-    """Load and preprocess data from a CSV file."""
-    logging.info(f"Loading data from {csv_file}.")
+# Columns of the processed dataset that are not model features
+NON_FEATURE_COLUMNS = ['Date', 'Close_Ticker_Shifted', 'Target', 'Ticker']
+MULTI_HORIZON_MODEL_FILE = os.path.join(output_dir, "xgb_multi_horizon.joblib")
+DATA_FILE = os.path.join(output_dir, "processed_stock_data.parquet")
+MODEL_FILE = os.path.join(output_dir, "xgb.joblib")
+
+# XGBoost parameters
+XGB_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "eta": 0.01,
+    "max_depth": 8,
+    "subsample": 0.9,
+    "colsample_bytree": 0.8,
+    "gamma": 5.0,
+    "alpha": 1.0,
+    "lambda": 7.0,
+    "random_state": 42
+}
+NUM_ROUNDS = 500
+EARLY_STOPPING_ROUNDS = 20
+
+# External-memory training
+EXTERNAL_BATCH_SIZE = 250_000
+EXTERNAL_CACHE_DIR = os.path.join(output_dir, "xgb_cache")
+
+# Train-test split shared by every training mode, and the binary cache of train_xgb's DMatrix pair
+SPLIT_CONFIG = {"test_size": 0.2, "random_state": 42, "stratify": "Target"}
+DMATRIX_CACHE_DIR = os.path.join(output_dir, "dmatrix_cache")
+
+# Checkpoints of the booster and its evaluation history during long trainings
+CHECKPOINT_DIR = os.path.join(output_dir, "checkpoints")
+CHECKPOINT_INTERVAL = 50
+CHECKPOINT_STATE_FILE = "checkpoint.json"
+
+# Incremental updates: trees added per update, and when to fall back to a full retrain
+MODEL_METADATA_FILE = os.path.join(output_dir, "xgb_metadata.json")
+UPDATE_ROUNDS = 20
+FULL_RETRAIN_DAYS = 90
+DRIFT_THRESHOLD = 0.02
+MIN_DRIFT_ROWS = 100
+
+# Lagged-window training
+LAGGED_BATCH_SIZE = 50_000
+
+# Walk-forward cross-validation
+CV_WINDOWS = ["expanding", "rolling"]
+# Share of each training window's last dates held out to pick the early stopping round
+CV_EARLY_STOPPING_FRACTION = 0.1
+
+def peak_memory_mb():
+    """Return the peak resident set size of the current process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def read_columns(data_file, columns=None):
+    """Read a Parquet (memory mapped) or CSV file, optionally projecting to the given columns.
+
+    Parquet files already carry the ETL's dtypes; CSV files are cast to the same schema.
+    """
+    if data_file.endswith(".csv"):
+        return apply_schema(pd.read_csv(data_file, usecols=columns))
+    return pq.read_table(data_file, columns=columns, memory_map=True).to_pandas()
+
+def column_names(data_file):
+    """Return the column names of a Parquet or CSV file without loading its data."""
+    if data_file.endswith(".csv"):
+        return list(pd.read_csv(data_file, nrows=0).columns)
+    return pq.read_schema(data_file).names
+
+def is_feature_column(col):
+    """True unless col is a key (Date, Ticker) or a label, including the multi-horizon ones."""
+    return col not in NON_FEATURE_COLUMNS and not col.startswith(HORIZON_LABEL_PREFIXES)
+
+def is_long_layout(columns):
+    """True if the processed data keeps each ticker's own prices instead of the wide pivot."""
+    return set(PRICE_FIELDS).issubset(columns)
+
+def load_data(data_file, peers=None):
+    """Load features and target from the processed Parquet (or CSV) file.
+
+    Long-layout files are expanded into the cross-ticker features through a FeatureStore,
+    for the given peers (all tickers by default).
+    """
+    logging.info(f"Loading data from {data_file}.")
     
     try:
-        df = pd.read_csv(csv_file)
-        logging.info(f"Data loaded successfully with {df.shape[0]} rows and {df.shape[1]} columns.")
-
         # Ensure necessary columns exist
-        required_columns = {'Date', 'Close_Ticker_Shifted', 'Target', 'Ticker'}
-        if not required_columns.issubset(df.columns):
-            error_msg = f"CSV file must contain the following columns: {required_columns}"
+        columns = column_names(data_file)
+        required_columns = set(NON_FEATURE_COLUMNS)
+        if not required_columns.issubset(columns):
+            error_msg = f"Data file must contain the following columns: {required_columns}"
             logging.error(error_msg)
             raise ValueError(error_msg)
 
-        # Define features and target
-        features = df.drop(columns=['Date', 'Close_Ticker_Shifted', 'Target', 'Ticker'])
-        target = df['Target']
-        
-        logging.info("Feature and target variables prepared successfully.")
+        # Only read the columns that become features or the target
+        if is_long_layout(columns):
+            df = read_columns(data_file, [col for col in columns if is_feature_column(col) or col in ['Date', 'Ticker', 'Target']])
+        else:
+            df = read_columns(data_file, [col for col in columns if is_feature_column(col)] + ['Target'])
+        logging.info(f"Data loaded successfully with {df.shape[0]} rows and {df.shape[1]} columns.")
+
+        features, target = features_from_frame(df, peers)
+        logging.info(f"Feature and target variables prepared successfully ({features.memory_usage(deep=True).sum() / 1e6:.1f} MB of features).")
         return features, target
 
     except Exception as e:
         logging.error(f"Error loading data: {e}", exc_info=True)
         raise
 
-def train_xgb(features, target):
+def load_dates(data_file):
+    """Read only the Date column, in the same row order as load_data's features."""
+    return read_columns(data_file, ['Date'])['Date']
+
+def load_labelled(data_file):
+    """
+    Whether each row (in load_data's order) has a next close and so a real Target. The last
+    row of every ticker has none and is labelled 0 by the ETL.
+    """
+    return read_columns(data_file, ['Close_Ticker_Shifted'])['Close_Ticker_Shifted'].notna()
+
+def load_sparse_data(data_file, peers=None):
+    """
+    Load the features as a CSR matrix in which missing values are absent instead of NaN.
+
+    For long-layout files the cross-ticker block comes straight from the FeatureStore's
+    per-date CSR rows, so a universe of tickers with different listing histories never
+    materializes its NaN cells. Returns (features, target, feature_names).
+    """
+    logging.info(f"Loading sparse data from {data_file}.")
+
+    try:
+        columns = column_names(data_file)
+        if is_long_layout(columns):
+            df = read_columns(data_file, [col for col in columns if is_feature_column(col) or col in ['Date', 'Ticker', 'Target']])
+            store = FeatureStore(df)
+            own_columns = [col for col in df.columns if is_feature_column(col) and col not in PRICE_FIELDS]
+            features = sparse.hstack([to_csr(df[own_columns].to_numpy(dtype=np.float32)), store.sparse_view(df, peers)], format="csr")
+            feature_names = own_columns + store.feature_names(peers)
+        else:
+            df = read_columns(data_file, [col for col in columns if is_feature_column(col)] + ['Target'])
+            feature_names = [col for col in df.columns if col != 'Target']
+            features = to_csr(df[feature_names].to_numpy(dtype=np.float32))
+
+        density = features.nnz / max(features.shape[0] * features.shape[1], 1)
+        size_mb = (features.data.nbytes + features.indices.nbytes + features.indptr.nbytes) / 1e6
+        logging.info(f"Sparse features: {features.shape[0]} rows x {features.shape[1]} columns, {features.nnz} stored values ({density:.1%} dense, {size_mb:.1f} MB).")
+        return features, df['Target'], feature_names
+
+    except Exception as e:
+        logging.error(f"Error loading sparse data: {e}", exc_info=True)
+        raise
+
+def features_from_frame(df, peers=None, store=None):
+    """Split a processed frame into features and target.
+
+    Long-layout frames get their cross-ticker prices from store (built from df if not given);
+    a frame that only has Date and no prices, such as one batch of a long file, needs a store.
+    """
+    if store is not None or is_long_layout(df.columns):
+        # Gather the cross-ticker prices by date instead of reading a wide pivot
+        feature_columns = [col for col in df.columns if is_feature_column(col) and col not in PRICE_FIELDS]
+        store = FeatureStore(df) if store is None else store
+        features = pd.concat([df[feature_columns], store.view(df, peers)], axis=1)
+        logging.info(f"Materialized {features.shape[1]} features for {len(store.tickers) if peers is None else len(peers)} peers.")
+    else:
+        features = df[[col for col in df.columns if is_feature_column(col)]]
+
+    return features, df['Target']
+
+def split_rows(target):
+    """Row positions (train_rows, test_rows) of the SPLIT_CONFIG stratified train-test split."""
+    return train_test_split(np.arange(len(target)), test_size=SPLIT_CONFIG["test_size"], random_state=SPLIT_CONFIG["random_state"], stratify=target)
+
+def split_dmatrices(features, target, feature_names=None, nthread=None):
+    """Stratified train-test split of the features (a DataFrame, or a CSR matrix with feature_names) into a (dtrain, dtest) DMatrix pair."""
+    X_train, X_test, y_train, y_test = train_test_split(
+        features, target, test_size=SPLIT_CONFIG["test_size"], random_state=SPLIT_CONFIG["random_state"], stratify=target
+    )
+    logging.info(f"Data split into training ({X_train.shape[0]} samples) and testing ({X_test.shape[0]} samples).")
+
+    # Convert data into DMatrix format
+    return (xgb.DMatrix(X_train, label=y_train, feature_names=feature_names, nthread=nthread),
+            xgb.DMatrix(X_test, label=y_test, feature_names=feature_names, nthread=nthread))
+
+class ResumableEarlyStopping(xgb.callback.EarlyStopping):
+    """EarlyStopping whose progress can be saved with a checkpoint and restored from it."""
+
+    def state(self):
+        """The scores seen so far and the rounds since the last improvement, as JSON-serializable data."""
+        return {
+            "stopping_history": self.stopping_history,
+            "best_scores": self.best_scores,
+            "current_rounds": self.current_rounds,
+        }
+
+    def load_state(self, state):
+        """Continue from a state() saved by an earlier run."""
+        self.stopping_history = state["stopping_history"]
+        self.best_scores = state["best_scores"]
+        self.current_rounds = state["current_rounds"]
+
+    def stopped(self):
+        """Whether the patience has run out."""
+        return self.current_rounds >= self.rounds
+
+class CheckpointCallback(xgb.callback.TrainingCallback):
+    """
+    Save the booster, the evaluation history and the early stopping state every `interval` rounds.
+
+    The booster goes to a new file named after its round count, and the checkpoint.json that
+    points at it is replaced atomically afterwards, so a run killed mid-write still leaves the
+    previous checkpoint usable.
+    """
+
+    def __init__(self, checkpoint_dir, interval, early_stopping, history, data_shape):
+        self.checkpoint_dir = checkpoint_dir
+        self.interval = interval
+        self.early_stopping = early_stopping
+        self.history = history  # evaluation history of the segments trained before this one
+        self.data_shape = data_shape
+        self.starting_round = 0
+
+    def before_training(self, model):
+        self.starting_round = model.num_boosted_rounds()
+        return model
+
+    def after_iteration(self, model, epoch, evals_log):
+        rounds = self.starting_round + epoch + 1
+        if rounds % self.interval == 0:
+            save_checkpoint(self.checkpoint_dir, model, {
+                "rounds": rounds,
+                "data_shape": self.data_shape,
+                "evals_log": merge_evals_log(self.history, evals_log),
+                "early_stopping": self.early_stopping.state(),
+            })
+        return False
+
+def merge_evals_log(history, evals_log):
+    """Append a segment's {data: {metric: [scores]}} evaluation log to the earlier history."""
+    return {
+        data: {metric: history.get(data, {}).get(metric, []) + list(scores) for metric, scores in metrics.items()}
+        for data, metrics in evals_log.items()
+    }
+
+def save_checkpoint(checkpoint_dir, model, state):
+    """Write the booster as UBJSON, then switch checkpoint.json to it and drop the older booster."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILE)
+    previous = load_checkpoint_state(checkpoint_dir)
+    state["booster_file"] = f"booster-{state['rounds']}.ubj"
+
+    booster_path = os.path.join(checkpoint_dir, state["booster_file"])
+    with open(booster_path + ".tmp", "wb") as f:
+        f.write(model.save_raw("ubj"))
+    os.replace(booster_path + ".tmp", booster_path)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(state_path + ".tmp", state_path)
+
+    if previous and previous["booster_file"] != state["booster_file"]:
+        os.remove(os.path.join(checkpoint_dir, previous["booster_file"]))
+    logging.info(f"Checkpoint saved after {state['rounds']} rounds in {checkpoint_dir}.")
+
+def load_checkpoint_state(checkpoint_dir):
+    """Return the last checkpoint's state, or None when there is none."""
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILE)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        return json.load(f)
+
+def clear_checkpoint(checkpoint_dir):
+    """Remove the checkpoint of a training that has finished."""
+    state = load_checkpoint_state(checkpoint_dir)
+    if state:
+        os.remove(os.path.join(checkpoint_dir, state["booster_file"]))
+        os.remove(os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILE))
+
+def train_checkpointed(params, dtrain, evallist, interval=CHECKPOINT_INTERVAL, resume=False, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    xgb.train with early stopping that checkpoints every `interval` rounds and can resume.
+
+    Training runs in segments of `interval` rounds, each one continued from the booster
+    reloaded from the checkpoint just written. XGBoost re-seeds its row and column sampling
+    whenever training continues from a saved booster, so going through the checkpoint on every
+    segment is what makes a resumed run produce exactly the same trees as an uninterrupted
+    one. Each segment is seeded with random_state + the rounds before it, so the segments do
+    not repeat each other's sampling draws. (A checkpointed model still differs from one
+    trained without checkpoints.)
+    """
+    data_shape = [dtrain.num_row(), dtrain.num_col()]
+    early_stopping = ResumableEarlyStopping(rounds=EARLY_STOPPING_ROUNDS)
+    state = load_checkpoint_state(checkpoint_dir) if resume else None
+    model, history = None, {}
+
+    if state:
+        if state["data_shape"] != data_shape:
+            raise ValueError(f"Checkpoint in {checkpoint_dir} was taken on {state['data_shape']} training data, not {data_shape}.")
+        model = xgb.Booster(model_file=os.path.join(checkpoint_dir, state["booster_file"]))
+        history = state["evals_log"]
+        early_stopping.load_state(state["early_stopping"])
+        logging.info(f"Resuming training from the checkpoint after {state['rounds']} rounds.")
+    elif resume:
+        logging.info(f"No checkpoint in {checkpoint_dir}; training from scratch.")
+    else:
+        clear_checkpoint(checkpoint_dir)
+
+    while (rounds := model.num_boosted_rounds() if model else 0) < NUM_ROUNDS:
+        if early_stopping.stopped():
+            break
+        segment = min(interval - rounds % interval, NUM_ROUNDS - rounds)
+        segment_params = dict(params, random_state=params.get("random_state", 0) + rounds)
+        checkpoint = CheckpointCallback(checkpoint_dir, interval, early_stopping, history, data_shape)
+        evals_result = {}
+        model = xgb.train(segment_params, dtrain, segment, evals=evallist, evals_result=evals_result, xgb_model=model,
+                          callbacks=[early_stopping, checkpoint], verbose_eval=False)
+        history = merge_evals_log(history, evals_result)
+        logging.info(f"Round {model.num_boosted_rounds()}: " + ", ".join(
+            f"{data}-{metric} {scores[-1]:.5f}" for data, metrics in history.items() for metric, scores in metrics.items()
+        ))
+
+        # Continue from the checkpoint rather than the in-memory booster (see the docstring)
+        state = load_checkpoint_state(checkpoint_dir)
+        if state and state["rounds"] == model.num_boosted_rounds():
+            model = xgb.Booster(model_file=os.path.join(checkpoint_dir, state["booster_file"]))
+
+    return model, history
+
+def fit_xgb(dtrain, dtest, model_path=MODEL_FILE, nthread=None, checkpoint_interval=0, resume=False):
+    """Boost on dtrain with early stopping on dtest, log the test and train accuracy and save the model.
+
+    nthread caps XGBoost's threads, for callers that train several models side by side.
+    checkpoint_interval > 0 (or resume) trains through train_checkpointed.
+    """
+    # XGBoost parameters
+    params = dict(XGB_PARAMS) if nthread is None else dict(XGB_PARAMS, nthread=nthread)
+    logging.info("XGBoost parameters set.")
+
+    # Train the model with early stopping
+    evallist = [(dtrain, "train"), (dtest, "eval")]
+    logging.info("Starting model training with early stopping.")
+    if checkpoint_interval or resume:
+        model, _ = train_checkpointed(params, dtrain, evallist, checkpoint_interval or CHECKPOINT_INTERVAL, resume)
+    else:
+        model = xgb.train(params, dtrain, NUM_ROUNDS, evals=evallist, early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=50)
+    logging.info("Model training completed.")
+
+    # Predict on test data
+    y_test = dtest.get_label().astype(int)
+    y_pred_prob = model.predict(dtest)
+    y_pred = (y_pred_prob > 0.5).astype(int)
+
+    # Evaluate performance
+    accuracy = accuracy_score(y_test, y_pred)
+    logging.info(f"Model Accuracy (Test): {accuracy:.4f}")
+    logging.info(f"Classification Report (Test):\n{classification_report(y_test, y_pred)}")
+
+    # Predict on train data
+    y_train = dtrain.get_label().astype(int)
+    y_pred_t = model.predict(dtrain)
+    y_pred_t = (y_pred_t > 0.5).astype(int)
+    accuracy_train = accuracy_score(y_train, y_pred_t)
+    logging.info(f"Model Accuracy (Train): {accuracy_train:.4f}")
+
+    # Save the model in the output directory
+    joblib.dump(model, model_path)
+    logging.info(f"Model saved at {model_path}.")
+    if checkpoint_interval or resume:
+        clear_checkpoint(CHECKPOINT_DIR)
+    return model
+
+def train_xgb(features, target, model_path=MODEL_FILE, feature_names=None, checkpoint_interval=0, resume=False):
     """Train an XGBoost model and evaluate performance."""
     logging.info("Starting XGBoost training.")
 
@@ -59,73 +413,555 @@ def train_xgb(features, target):
         scale_pos_weight = class_weights[1] / class_weights[0]
         logging.info(f"Computed class weights: {class_weights}.")
 
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(
-            features, target, test_size=0.2, random_state=42, stratify=target
+        dtrain, dtest = split_dmatrices(features, target, feature_names)
+        return fit_xgb(dtrain, dtest, model_path, checkpoint_interval=checkpoint_interval, resume=resume)
+
+    except Exception as e:
+        logging.error(f"Error during model training: {e}", exc_info=True)
+        raise
+
+def dmatrix_cache_key(data_file, peers=None):
+    """
+    Key of the prepared matrices: the dataset's content, the code that turns it into features,
+    the split and peer configuration, and the XGBoost version that wrote the binary files.
+    """
+    code = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name) for name in ("feature_store.py", "schema.py", "model_training.py")]
+    config = {"split": SPLIT_CONFIG, "peers": None if peers is None else list(peers), "xgboost": xgb.__version__}
+    return fingerprint([data_file] + code, config=config)
+
+def load_dmatrices(data_file, peers=None, cache_dir=DMATRIX_CACHE_DIR):
+    """
+    Return the (dtrain, dtest) pair for a processed file, from the binary cache when possible.
+
+    On a miss the data is loaded, split and converted as in train_xgb, and both matrices are
+    written with DMatrix.save_binary under their cache key, so the next run with the same
+    dataset and split skips parsing, feature building and DMatrix construction.
+    """
+    key = dmatrix_cache_key(data_file, peers)
+    paths = {name: os.path.join(cache_dir, f"{key[:16]}.{name}.buffer") for name in ("train", "test")}
+
+    if all(os.path.exists(path) for path in paths.values()):
+        logging.info(f"Loading cached DMatrix pair {key[:16]} from {cache_dir}.")
+        return xgb.DMatrix(paths["train"]), xgb.DMatrix(paths["test"])
+
+    logging.info(f"No cached DMatrix pair for {key[:16]}, building it.")
+    features, target = load_data(data_file, peers)
+    dtrain, dtest = split_dmatrices(features, target)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for dmatrix, name in ((dtrain, "train"), (dtest, "test")):
+        # Write under a temporary name so an interrupted run never leaves a partial cache entry
+        dmatrix.save_binary(paths[name] + ".tmp")
+        os.replace(paths[name] + ".tmp", paths[name])
+    logging.info(f"Cached DMatrix pair {key[:16]} in {cache_dir}.")
+    return dtrain, dtest
+
+def train_xgb_cached(data_file, model_path=MODEL_FILE, peers=None, cache_dir=DMATRIX_CACHE_DIR, checkpoint_interval=0, resume=False):
+    """train_xgb on matrices from the binary DMatrix cache."""
+    logging.info("Starting XGBoost training from the DMatrix cache.")
+
+    try:
+        started = time.perf_counter()
+        dtrain, dtest = load_dmatrices(data_file, peers, cache_dir)
+        logging.info(f"Training matrices ready in {time.perf_counter() - started:.2f}s.")
+        return fit_xgb(dtrain, dtest, model_path, checkpoint_interval=checkpoint_interval, resume=resume)
+
+    except Exception as e:
+        logging.error(f"Error during model training: {e}", exc_info=True)
+        raise
+
+def train_multi_horizon(data_file, horizons, model_path=MULTI_HORIZON_MODEL_FILE, peers=None):
+    """
+    Fit the up/down labels of several horizons (Target_{h} from the ETL's --horizons) in one job.
+
+    The features are loaded and turned into one DMatrix pair once; each horizon's booster is
+    then trained on it by swapping in that horizon's labels, so the data loading, the matrix
+    construction and the hist quantile sketch are shared and each booster keeps its own early
+    stopping. Saves {horizon: booster}.
+    """
+    logging.info(f"Starting multi-horizon XGBoost training for horizons {horizons}.")
+
+    try:
+        label_columns = [f"Target_{h}" for h in horizons]
+        missing = sorted(set(label_columns) - set(column_names(data_file)))
+        if missing:
+            raise ValueError(f"Data file has no {missing} labels; run the ETL with --horizons {','.join(map(str, horizons))}.")
+
+        features, target = load_data(data_file, peers)
+        labels = read_columns(data_file, label_columns).to_numpy()
+
+        # Same split as train_xgb, stratified on the next-day Target
+        train_rows, test_rows = split_rows(target)
+        dtrain = xgb.DMatrix(features.iloc[train_rows])
+        dtest = xgb.DMatrix(features.iloc[test_rows])
+        logging.info(f"Data split into training ({len(train_rows)} samples) and testing ({len(test_rows)} samples).")
+
+        params = dict(XGB_PARAMS, tree_method="hist")
+        models = {}
+        for k, horizon in enumerate(horizons):
+            started = time.perf_counter()
+            dtrain.set_label(labels[train_rows, k])
+            dtest.set_label(labels[test_rows, k])
+            model = xgb.train(params, dtrain, NUM_ROUNDS, evals=[(dtrain, "train"), (dtest, "eval")],
+                              early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+
+            y_pred = (model.predict(dtest) > 0.5).astype(int)
+            logging.info(
+                f"{horizon}-day model: {model.best_iteration + 1} rounds in {time.perf_counter() - started:.2f}s, "
+                f"Model Accuracy (Test): {accuracy_score(labels[test_rows, k], y_pred):.4f}"
+            )
+            models[horizon] = model
+
+        joblib.dump(models, model_path)
+        logging.info(f"Multi-horizon models saved at {model_path}.")
+        return models
+
+    except Exception as e:
+        logging.error(f"Error during multi-horizon model training: {e}", exc_info=True)
+        raise
+
+def walk_forward_folds(dates, n_folds, window="expanding"):
+    """
+    Split rows into walk-forward folds over their dates.
+
+    The sorted unique dates are cut into n_folds + 1 consecutive blocks. Fold k tests on
+    block k + 1 and trains on every earlier block ("expanding") or only on block k
+    ("rolling"), so a fold never trains on days after the ones it is evaluated on.
+
+    Returns a list of (train_idx, test_idx) arrays of row positions.
+    """
+    if window not in CV_WINDOWS:
+        raise ValueError(f"Unknown window {window!r}, expected one of {CV_WINDOWS}.")
+
+    unique_dates, date_idx = np.unique(np.asarray(dates), return_inverse=True)
+    if len(unique_dates) < n_folds + 1:
+        raise ValueError(f"{len(unique_dates)} distinct dates are not enough for {n_folds} folds.")
+    block = np.array_split(np.arange(len(unique_dates)), n_folds + 1)
+    block_of_date = np.concatenate([np.full(len(b), i) for i, b in enumerate(block)])
+    row_block = block_of_date[date_idx]
+
+    folds = []
+    for k in range(n_folds):
+        first_train_block = 0 if window == "expanding" else k
+        train_mask = (row_block >= first_train_block) & (row_block <= k)
+        folds.append((np.flatnonzero(train_mask), np.flatnonzero(row_block == k + 1)))
+    return folds
+
+# Worker processes inherit the dataset through the pool initializer instead of pickling it per fold
+_cv_data = {}
+
+def _init_cv_worker(features, target, dates):
+    _cv_data.update(features=features, target=target, dates=dates)
+
+def train_fold(fold, train_idx, test_idx, nthread):
+    """
+    Train and evaluate one walk-forward fold in a worker. Returns its metrics.
+
+    The last CV_EARLY_STOPPING_FRACTION of the training window's dates pick the early
+    stopping round, so the test block is only scored once, by the finished model.
+    """
+    started = time.perf_counter()
+    features, target, dates = _cv_data["features"], _cv_data["target"], _cv_data["dates"]
+
+    train_dates = np.unique(dates.iloc[train_idx])
+    if len(train_dates) < 2:
+        raise ValueError(f"Fold {fold} has {len(train_dates)} training dates, too few to hold out early stopping dates.")
+    n_stop_dates = min(max(1, int(round(len(train_dates) * CV_EARLY_STOPPING_FRACTION))), len(train_dates) - 1)
+    is_stop = (dates.iloc[train_idx] >= train_dates[-n_stop_dates]).to_numpy()
+    fit_idx, stop_idx = train_idx[~is_stop], train_idx[is_stop]
+
+    dtrain = xgb.DMatrix(features.iloc[fit_idx], label=target.iloc[fit_idx], nthread=nthread)
+    dstop = xgb.DMatrix(features.iloc[stop_idx], label=target.iloc[stop_idx], nthread=nthread)
+    params = dict(XGB_PARAMS, nthread=nthread)
+    model = xgb.train(params, dtrain, NUM_ROUNDS, evals=[(dstop, "eval")],
+                      early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+
+    y_test = target.iloc[test_idx]
+    dtest = xgb.DMatrix(features.iloc[test_idx], nthread=nthread)
+    y_pred_prob = model.predict(dtest, iteration_range=(0, model.best_iteration + 1))
+    return {
+        "fold": fold,
+        "train_start": dates.iloc[train_idx].min().date(),
+        "train_end": dates.iloc[train_idx].max().date(),
+        "test_start": dates.iloc[test_idx].min().date(),
+        "test_end": dates.iloc[test_idx].max().date(),
+        "train_rows": len(fit_idx),
+        "early_stopping_rows": len(stop_idx),
+        "test_rows": len(test_idx),
+        "best_iteration": model.best_iteration,
+        "logloss": log_loss(y_test, y_pred_prob, labels=[0, 1]),
+        "accuracy": accuracy_score(y_test, (y_pred_prob > 0.5).astype(int)),
+        "seconds": time.perf_counter() - started,
+    }
+
+def cross_validate(features, target, dates, n_folds=5, window="expanding", workers=None):
+    """
+    Walk-forward cross-validation with the folds trained concurrently.
+
+    Each of the workers processes gets an equal share of the CPU cores as XGBoost threads,
+    so the pool as a whole does not oversubscribe the machine.
+
+    Returns a DataFrame with one row of metrics per fold.
+    """
+    logging.info(f"Starting {window} walk-forward cross-validation with {n_folds} folds.")
+
+    try:
+        folds = walk_forward_folds(dates, n_folds, window)
+        workers = min(workers or n_folds, n_folds, os.cpu_count())
+        nthread = max(1, os.cpu_count() // workers)
+        logging.info(f"Training folds on {workers} worker processes with {nthread} threads each.")
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_cv_worker,
+                                 initargs=(features, target.reset_index(drop=True), dates.reset_index(drop=True))) as executor:
+            futures = [executor.submit(train_fold, k, train_idx, test_idx, nthread) for k, (train_idx, test_idx) in enumerate(folds)]
+            results = []
+            for future in futures:
+                metrics = future.result()
+                logging.info(f"Fold {metrics['fold']}: {metrics}")
+                results.append(metrics)
+
+        results = pd.DataFrame(results)
+        logging.info(
+            f"Cross-validation finished in {time.perf_counter() - started:.2f}s "
+            f"(sum of fold times {results['seconds'].sum():.2f}s). "
+            f"Log loss {results['logloss'].mean():.4f} +/- {results['logloss'].std():.4f}, "
+            f"accuracy {results['accuracy'].mean():.4f} +/- {results['accuracy'].std():.4f}."
         )
-        logging.info(f"Data split into training ({X_train.shape[0]} samples) and testing ({X_test.shape[0]} samples).")
-
-        # Convert data into DMatrix format
-        dtrain = xgb.DMatrix(X_train, label=y_train)
-        dtest = xgb.DMatrix(X_test, label=y_test)
-
-        # XGBoost parameters
-        params = {
-            "objective": "binary:logistic",
-            "eval_metric": "logloss",
-            "eta": 0.01,
-            "max_depth": 8,
-            "subsample": 0.9,
-            "colsample_bytree": 0.8,
-            "gamma": 5.0,
-            "alpha": 1.0,
-            "lambda": 7.0,
-            "random_state": 42
-        }
-        logging.info("XGBoost parameters set.")
+        return results
+
+    except Exception as e:
+        logging.error(f"Error during cross-validation: {e}", exc_info=True)
+        raise
+
+def load_model_metadata(metadata_path=MODEL_METADATA_FILE):
+    """Return the metadata saved with the current model, or None if there is none."""
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        return json.load(f)
+
+def save_model_metadata(metadata, metadata_path=MODEL_METADATA_FILE):
+    """Persist the model metadata atomically, so it never disagrees with a half-written file."""
+    with open(metadata_path + ".tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_path + ".tmp", metadata_path)
+
+def training_metadata(model, dates, labelled):
+    """
+    Update metadata of a model freshly trained (with early stopping) on rows up to dates.max().
+    It counts as trained through the last labelled date, so that the rows still waiting for
+    their next close are picked up by an update once they have it.
+    """
+    return {
+        "trained_through": dates[labelled.to_numpy()].max().strftime(DATE_FORMAT),
+        "last_full_retrain": dates.max().strftime(DATE_FORMAT),
+        "baseline_logloss": float(model.best_score),
+        "num_trees": model.num_boosted_rounds(),
+        "updates": 0,
+        "drift_rows": 0,
+        "drift_loss": 0.0,
+    }
+
+def full_retrain(features, target, dates, labelled, model_path=MODEL_FILE, metadata_path=MODEL_METADATA_FILE,
+                 checkpoint_interval=0, resume=False):
+    """Train from scratch on all history and reset the update metadata."""
+    model = train_xgb(features, target, model_path, checkpoint_interval=checkpoint_interval, resume=resume)
+    save_model_metadata(training_metadata(model, dates, labelled), metadata_path)
+    return model
+
+def update_xgb(features, target, dates, labelled, model_path=MODEL_FILE, metadata_path=MODEL_METADATA_FILE,
+               update_rounds=UPDATE_ROUNDS, retrain_days=FULL_RETRAIN_DAYS, drift_threshold=DRIFT_THRESHOLD):
+    """
+    Refresh the saved model with the days that arrived since it was trained.
 
-        # Train the model with early stopping
+    The previous booster is loaded and update_rounds trees are boosted on the new rows only
+    (continued training via xgb_model). Only labelled rows (see load_labelled) count as new:
+    a ticker's latest day has no next close yet and joins the following update instead. It falls back to a full retrain when there is no
+    previous model, when the last full retrain is more than retrain_days behind the data, or
+    when the model's log loss on the new, unseen rows exceeds its baseline by more than
+    drift_threshold (relative).
+    """
+    logging.info("Starting incremental model update.")
+
+    try:
+        metadata = load_model_metadata(metadata_path)
+        if metadata is None or not os.path.exists(model_path):
+            logging.info("No previous model and metadata found, running a full retrain.")
+            return full_retrain(features, target, dates, labelled, model_path, metadata_path)
+
+        days_since_retrain = (dates.max() - pd.Timestamp(metadata["last_full_retrain"])).days
+        if days_since_retrain > retrain_days:
+            logging.info(f"Last full retrain is {days_since_retrain} days old (limit {retrain_days}), running a full retrain.")
+            return full_retrain(features, target, dates, labelled, model_path, metadata_path)
+
+        is_new = labelled.to_numpy() & (dates > pd.Timestamp(metadata["trained_through"])).to_numpy()
+        model = joblib.load(model_path)
+        if not is_new.any():
+            logging.info(f"No labelled rows after {metadata['trained_through']}, the model is up to date.")
+            return model
+
+        dnew = xgb.DMatrix(features[is_new], label=target[is_new])
+        new_loss = log_loss(target[is_new], model.predict(dnew), labels=[0, 1], normalize=False)
+        logging.info(f"{is_new.sum()} new labelled rows; log loss of the current model on them: {new_loss / is_new.sum():.5f} (baseline {metadata['baseline_logloss']:.5f}).")
+
+        # Too few rows give a noisy log loss, so the out-of-sample losses of the new rows are
+        # accumulated over updates (daily refreshes add only a handful of rows) and drift is
+        # judged once they reach MIN_DRIFT_ROWS
+        drift_rows = metadata.get("drift_rows", 0) + int(is_new.sum())
+        drift_loss = metadata.get("drift_loss", 0.0) + float(new_loss)
+        if drift_rows >= MIN_DRIFT_ROWS:
+            logging.info(f"Log loss over the {drift_rows} rows since the last drift check: {drift_loss / drift_rows:.5f}.")
+            if drift_loss / drift_rows > metadata["baseline_logloss"] * (1 + drift_threshold):
+                logging.info(f"Log loss drifted more than {drift_threshold:.0%} above the baseline, running a full retrain.")
+                return full_retrain(features, target, dates, labelled, model_path, metadata_path)
+            drift_rows, drift_loss = 0, 0.0
+
+        started = time.perf_counter()
+        model = xgb.train(dict(XGB_PARAMS), dnew, update_rounds, xgb_model=model)
+        # The early stopping result of the last full retrain does not describe the added trees
+        model.set_attr(best_iteration=None, best_score=None)
+        logging.info(
+            f"Added {update_rounds} trees on the new rows in {time.perf_counter() - started:.2f}s "
+            f"(now {model.num_boosted_rounds()} trees)."
+        )
+
+        joblib.dump(model, model_path)
+        metadata.update(
+            trained_through=dates[is_new].max().strftime(DATE_FORMAT),
+            num_trees=model.num_boosted_rounds(),
+            updates=metadata["updates"] + 1,
+            drift_rows=drift_rows,
+            drift_loss=drift_loss,
+        )
+        save_model_metadata(metadata, metadata_path)
+        logging.info(f"Updated model saved at {model_path}, trained through {metadata['trained_through']}.")
+        return model
+
+    except Exception as e:
+        logging.error(f"Error during incremental model update: {e}", exc_info=True)
+        raise
+
+class ParquetBatchIter(xgb.DataIter):
+    """
+    Streams (features, label) batches of the processed Parquet file into XGBoost.
+
+    Rows are assigned to the train or eval subset by a seeded draw per batch, so both
+    iterators agree on the split without ever holding the dataset in memory. Long-layout
+    files get their cross-ticker features gathered per batch from a FeatureStore.
+    """
+
+    def __init__(self, data_file, subset, batch_size=EXTERNAL_BATCH_SIZE, cache_prefix=None,
+                 test_size=SPLIT_CONFIG["test_size"], seed=SPLIT_CONFIG["random_state"], peers=None):
+        self._data_file = data_file
+        self._subset = subset
+        self._batch_size = batch_size
+        self._test_size = test_size
+        self._seed = seed
+        self._peers = peers
+
+        columns = column_names(data_file)
+        if is_long_layout(columns):
+            self._store = FeatureStore.from_parquet(data_file)
+            self._columns = [col for col in columns if is_feature_column(col) and col not in PRICE_FIELDS] + ['Date', 'Target']
+        else:
+            self._store = None
+            self._columns = [col for col in columns if is_feature_column(col)] + ['Target']
+
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = None
+
+    def next(self, input_data):
+        if self._batches is None:
+            parquet_file = pq.ParquetFile(self._data_file, memory_map=True)
+            self._batches = enumerate(parquet_file.iter_batches(batch_size=self._batch_size, columns=self._columns))
+
+        batch_number, batch = next(self._batches, (None, None))
+        if batch is None:
+            return False
+
+        df = batch.to_pandas()
+        in_eval = np.random.default_rng([self._seed, batch_number]).random(len(df)) < self._test_size
+        df = df[in_eval if self._subset == "eval" else ~in_eval]
+
+        features, target = features_from_frame(df, self._peers, self._store)
+        input_data(data=features, label=target.to_numpy())
+        return True
+
+class FrameBatchIter(xgb.DataIter):
+    """Feeds XGBoost from a function returning an iterator of (features, label) batches, called once per pass."""
+
+    def __init__(self, make_batches):
+        self._make_batches = make_batches
+        self._batches = None
+        super().__init__()
+
+    def reset(self):
+        self._batches = None
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self._make_batches()
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        input_data(data=batch[0], label=batch[1])
+        return True
+
+def train_xgb_lagged(data_file, lags, batch_size=LAGGED_BATCH_SIZE, model_path=MODEL_FILE, peers=None):
+    """
+    Train on the last `lags` days of the cross-ticker prices, flattened to lags x fields x peers
+    features per row, on top of the row's own non-price features.
+
+    The lookback windows are strided views over the FeatureStore grid; each batch gathers only
+    its rows out of them and is quantized straight into a QuantileDMatrix, so neither the
+    shift-and-concat frame nor the full float tensor is ever materialized.
+    """
+    logging.info(f"Starting XGBoost training with {lags} lagged days.")
+
+    try:
+        columns = column_names(data_file)
+        if not is_long_layout(columns):
+            raise ValueError("Lagged training needs the long layout (run the ETL with --layout long).")
+
+        df = read_columns(data_file, [col for col in columns if is_feature_column(col) or col in ['Date', 'Ticker', 'Target']])
+        store = FeatureStore(df)
+        own_columns = [col for col in df.columns if is_feature_column(col) and col not in PRICE_FIELDS]
+        n_lagged = len(store.lagged_feature_names(lags, peers))
+        logging.info(
+            f"{len(df)} rows x {n_lagged} lagged features ({len(df) * n_lagged * 4 / 1e6:.1f} MB as a dense tensor), "
+            f"built in batches of {batch_size} rows."
+        )
+
+        # Same stratified split as train_xgb, applied to row positions
+        train_rows, test_rows = split_rows(df['Target'])
+
+        def batches(rows):
+            subset = df.iloc[np.sort(rows)]
+            for batch, lagged in store.iter_lagged_views(subset, lags, batch_size, peers):
+                yield pd.concat([batch[own_columns], lagged], axis=1), batch['Target'].to_numpy()
+
+        dtrain = xgb.QuantileDMatrix(FrameBatchIter(lambda: batches(train_rows)))
+        dtest = xgb.QuantileDMatrix(FrameBatchIter(lambda: batches(test_rows)), ref=dtrain)
+        logging.info(f"Quantized matrices built: {dtrain.num_row()} training and {dtest.num_row()} testing samples. Peak memory: {peak_memory_mb():.1f} MB.")
+
+        params = dict(XGB_PARAMS, tree_method="hist")
         evallist = [(dtrain, "train"), (dtest, "eval")]
-        num_rounds = 500
-        logging.info("Starting model training with early stopping.")
-        model = xgb.train(params, dtrain, num_rounds, evals=evallist, early_stopping_rounds=20, verbose_eval=50)
+        model = xgb.train(params, dtrain, NUM_ROUNDS, evals=evallist, early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=50)
         logging.info("Model training completed.")
 
-        # Predict on test data
-        y_pred_prob = model.predict(dtest)
-        y_pred = (y_pred_prob > 0.5).astype(int)
-        
-        # Evaluate performance
-        accuracy = accuracy_score(y_test, y_pred)
-        logging.info(f"Model Accuracy (Test): {accuracy:.4f}")
+        y_test = dtest.get_label()
+        y_pred = (model.predict(dtest) > 0.5).astype(int)
+        logging.info(f"Model Accuracy (Test): {accuracy_score(y_test, y_pred):.4f}")
         logging.info(f"Classification Report (Test):\n{classification_report(y_test, y_pred)}")
 
-        # Predict on train data
-        y_pred_t = model.predict(dtrain)
-        y_pred_t = (y_pred_t > 0.5).astype(int)
-        accuracy_train = accuracy_score(y_train, y_pred_t)
-        logging.info(f"Model Accuracy (Train): {accuracy_train:.4f}")
+        joblib.dump(model, model_path)
+        logging.info(f"Model saved at {model_path}. Peak memory: {peak_memory_mb():.1f} MB.")
+        return model
+
+    except Exception as e:
+        logging.error(f"Error during lagged model training: {e}", exc_info=True)
+        raise
+
+def train_xgb_external(data_file, batch_size=EXTERNAL_BATCH_SIZE, model_path=MODEL_FILE, cache_dir=EXTERNAL_CACHE_DIR, peers=None):
+    """
+    Train with XGBoost's external memory: the processed file is streamed in batches into
+    quantile-sketched (hist) pages cached on disk, so only one batch plus the cache pages
+    in use have to be in RAM. Long-layout files still hold the date x ticker price grid
+    for the cross-ticker features, which is small next to the row count.
+    """
+    logging.info(f"Starting external-memory XGBoost training on {data_file} in batches of {batch_size} rows.")
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        train_iter = ParquetBatchIter(data_file, "train", batch_size, os.path.join(cache_dir, "train"), peers=peers)
+        eval_iter = ParquetBatchIter(data_file, "eval", batch_size, os.path.join(cache_dir, "eval"), peers=peers)
+
+        if hasattr(xgb, "ExtMemQuantileDMatrix"):
+            dtrain = xgb.ExtMemQuantileDMatrix(train_iter)
+            dtest = xgb.ExtMemQuantileDMatrix(eval_iter, ref=dtrain)
+        else:
+            # XGBoost < 3.0 builds paged external-memory matrices from the iterator directly
+            dtrain = xgb.DMatrix(train_iter)
+            dtest = xgb.DMatrix(eval_iter)
+        logging.info(f"External-memory matrices built: {dtrain.num_row()} training and {dtest.num_row()} testing samples. Peak memory: {peak_memory_mb():.1f} MB.")
+
+        params = dict(XGB_PARAMS, tree_method="hist")
+        evallist = [(dtrain, "train"), (dtest, "eval")]
+        model = xgb.train(params, dtrain, NUM_ROUNDS, evals=evallist, early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=50)
+        logging.info("Model training completed.")
+
+        y_test = dtest.get_label()
+        y_pred = (model.predict(dtest) > 0.5).astype(int)
+        logging.info(f"Model Accuracy (Test): {accuracy_score(y_test, y_pred):.4f}")
+        logging.info(f"Classification Report (Test):\n{classification_report(y_test, y_pred)}")
 
-        # Save the model in the output directory
-        model_path = os.path.join(output_dir, "xgb.joblib")
         joblib.dump(model, model_path)
-        logging.info(f"Model saved at {model_path}.")
+        logging.info(f"Model saved at {model_path}. Peak memory: {peak_memory_mb():.1f} MB.")
+        return model
 
     except Exception as e:
-        logging.error(f"Error during model training: {e}", exc_info=True)
+        logging.error(f"Error during external-memory model training: {e}", exc_info=True)
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the XGBoost market movement model.")
+    parser.add_argument("--input", default=DATA_FILE, help="Processed data from the ETL script (Parquet or CSV).")
+    # Training modes; without one, the model is fully retrained in memory
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--external-memory", action="store_true", help="Stream the Parquet file in batches instead of loading it into memory.")
+    parser.add_argument("--batch-size", type=int, default=EXTERNAL_BATCH_SIZE, help="Rows per batch in external-memory mode.")
+    modes.add_argument("--horizons", default="", help="Comma-separated horizons (e.g. 1,5,20) to fit in one job on a shared feature matrix.")
+    modes.add_argument("--sparse", action="store_true", help="Load the features as a sparse matrix, leaving missing cross-ticker prices out.")
+    modes.add_argument("--dmatrix-cache", action="store_true", help="Reuse the train/test DMatrix pair saved by an earlier run on the same data and split.")
+    modes.add_argument("--lags", type=int, default=0, help="Train on this many days of lagged cross-ticker prices (long layout only).")
+    modes.add_argument("--update", action="store_true", help="Add trees for the days since the last training instead of retraining (falls back to a full retrain on schedule or drift).")
+    parser.add_argument("--checkpoint-every", type=int, default=0, help="Checkpoint the booster and evaluation history to output/checkpoints every this many rounds.")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint of an interrupted checkpointed run.")
+    modes.add_argument("--cv-folds", type=int, default=0, help="Run walk-forward cross-validation with this many folds instead of training the model.")
+    parser.add_argument("--cv-window", choices=CV_WINDOWS, default="expanding", help="Train each fold on all earlier dates (expanding) or only the preceding block (rolling).")
+    parser.add_argument("--cv-workers", type=int, default=None, help="Worker processes for the folds (default: one per fold, capped at the CPU count).")
+    args = parser.parse_args()
+    if (args.checkpoint_every or args.resume) and (args.external_memory or args.horizons or args.lags or args.update or args.cv_folds):
+        parser.error("--checkpoint-every and --resume only apply to the default, --sparse and --dmatrix-cache training.")
+
     logging.info("Script execution started.")
 
     try:
-        csv_file = os.path.join(output_dir, "processed_stock_data.csv")  # Use processed data from ETL script
-        features, target = load_data(csv_file)
-        train_xgb(features, target)
+        fresh_model = None
+        if args.cv_folds:
+            features, target = load_data(args.input)
+            results = cross_validate(features, target, load_dates(args.input), args.cv_folds, args.cv_window, args.cv_workers)
+            print(results.to_string(index=False))
+        elif args.horizons:
+            train_multi_horizon(args.input, [int(h) for h in args.horizons.split(",")])
+        elif args.sparse:
+            features, target, feature_names = load_sparse_data(args.input)
+            fresh_model = train_xgb(features, target, feature_names=feature_names, checkpoint_interval=args.checkpoint_every, resume=args.resume)
+        elif args.dmatrix_cache:
+            fresh_model = train_xgb_cached(args.input, checkpoint_interval=args.checkpoint_every, resume=args.resume)
+        elif args.lags:
+            fresh_model = train_xgb_lagged(args.input, args.lags)
+        elif args.update:
+            features, target = load_data(args.input)
+            update_xgb(features, target, load_dates(args.input), load_labelled(args.input))
+        elif args.external_memory:
+            fresh_model = train_xgb_external(args.input, args.batch_size)
+        else:
+            features, target = load_data(args.input)
+            full_retrain(features, target, load_dates(args.input), load_labelled(args.input), checkpoint_interval=args.checkpoint_every, resume=args.resume)
+
+        # The other modes that write MODEL_FILE start a fresh update history for it as well
+        if fresh_model is not None:
+            save_model_metadata(training_metadata(fresh_model, load_dates(args.input), load_labelled(args.input)))
 
         logging.info("Model training completed successfully.")
 
     except Exception as e:
         logging.critical("Script execution failed.", exc_info=True)
     
-    print(f"Model training completed successfully. Model saved at {os.path.join(output_dir, 'xgb.joblib')}.")
+    if not args.cv_folds:
+        print(f"Model training completed successfully. Model saved at {MULTI_HORIZON_MODEL_FILE if args.horizons else MODEL_FILE}.")
@@ -0,0 +1,42 @@
+import pandas as pd
+import numpy as np
+
+# Declared column types shared by etl.py and model_training.py:
+#   Ticker -> categorical, Date -> datetime64, prices/volumes/features -> float32, labels -> int8
+# float32 volumes (rather than integers) keep missing values representable as NaN.
+FLOAT_DTYPE = np.float32
+TARGET_DTYPE = np.int8
+DATE_FORMAT = "%Y-%m-%d"
+
+# Multi-horizon labels written by the ETL's --horizons (Forward_Return_5, Target_5, ...)
+HORIZON_LABEL_PREFIXES = ("Forward_Return_", "Target_")
+
+# Raw columns parsed from the SimFin bulk file; Ticker and Date are converted after filtering
+RAW_PRICE_DTYPES = {
+    "Ticker": str,
+    "Date": str,
+    "Open": FLOAT_DTYPE,
+    "High": FLOAT_DTYPE,
+    "Low": FLOAT_DTYPE,
+    "Close": FLOAT_DTYPE,
+    "Adj. Close": FLOAT_DTYPE,
+    "Volume": FLOAT_DTYPE,
+    "Shares Outstanding": FLOAT_DTYPE,
+}
+
+def ticker_dtype(tickers):
+    """Categorical dtype with the tickers in sorted order, so sorting by Ticker stays alphabetical."""
+    return pd.CategoricalDtype(sorted(tickers))
+
+def apply_schema(df, tickers=None):
+    """Cast a raw or processed frame to the declared dtypes, in place. Returns df for chaining."""
+    for col in df.columns:
+        if col == "Ticker":
+            df[col] = df[col].astype(ticker_dtype(df[col].dropna().unique() if tickers is None else tickers))
+        elif col == "Date":
+            df[col] = pd.to_datetime(df[col], format=DATE_FORMAT)
+        elif col.startswith("Target"):
+            df[col] = df[col].astype(TARGET_DTYPE)
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(FLOAT_DTYPE)
+    return df
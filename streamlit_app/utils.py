@@ -1,6 +1,7 @@
 # Libraries
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import pytz
 import requests
@@ -15,6 +16,9 @@ import joblib
 from backtesting import Backtest, Strategy
 from io import StringIO
 import tempfile
+import os
+import logging
+import threading
 from PIL import Image, ImageOps, ImageDraw
 
 # Python Wrapper for the SimFin API
@@ -112,8 +116,7 @@ class PySimFin:
         Process:
             - Fetches stock price data for a predefined list of tickers in batches to avoid API overload.
             - Renames columns for consistency.
-            - Aggregates data across tickers and pivots it to structure the dataset.
-            - Merges the transformed data back to maintain ticker-specific target variables.
+            - Aggregates data across tickers and gathers every ticker's prices for each row's date.
             - Drops redundant columns to prepare the dataset for modeling.
 
         Raises:
@@ -141,18 +144,8 @@ class PySimFin:
         # Combine all data
         df_tickers = pd.concat(all_data)
 
-        pivoted_df = df_tickers.pivot(index="Date", columns="Ticker", values=["Open", "High", "Low", "Close", "Adj. Close", "Volume"])
-
-        # Flatten column names
-        pivoted_df.columns = [f"{col[0]}_{col[1]}" for col in pivoted_df.columns]
-        pivoted_df.reset_index(inplace=True)
-
-        # Merge with original dataset to ensure each ticker retains its own target variable
-        merged_df = df_tickers.merge(pivoted_df, on="Date", how="left")
-
-        cols_to_drop = ["Open", "High", "Low", "Close", "Adj. Close", "Volume", "Dividend Paid"]
-        merged_df.drop(columns=cols_to_drop, inplace=True)
-        return merged_df
+        # Each row keeps its own columns and gets every ticker's prices for its date
+        return gather_peer_features(df_tickers)
     
     def get_predictions_data_backtest(self, start_date, end_date) -> pd.DataFrame:
         '''
@@ -177,18 +170,8 @@ class PySimFin:
         # Combine all data
         df_tickers = pd.concat(all_data)
 
-        pivoted_df = df_tickers.pivot(index="Date", columns="Ticker", values=["Open", "High", "Low", "Close", "Adj. Close", "Volume"])
-
-        # Flatten column names
-        pivoted_df.columns = [f"{col[0]}_{col[1]}" for col in pivoted_df.columns]
-        pivoted_df.reset_index(inplace=True)
-
-        # Merge with original dataset to ensure each ticker retains its own target variable
-        merged_df = df_tickers.merge(pivoted_df, on="Date", how="left")
-
-        cols_to_drop = ["Open", "High", "Low", "Close", "Adj. Close", "Volume", "Dividend Paid"]
-        merged_df.drop(columns=cols_to_drop, inplace=True)
-        return merged_df
+        # Each row keeps its own columns and gets every ticker's prices for its date
+        return gather_peer_features(df_tickers)
     
     def get_stock_prices_backtest(self, tickers: list, start_date, end_date) -> pd.DataFrame:
         """
@@ -242,6 +225,181 @@ class PySimFin:
 
         return final_df
 
+PEER_FIELDS = ["Open", "High", "Low", "Close", "Adj. Close", "Volume"]
+
+def gather_peer_features(df_tickers: pd.DataFrame, peers: list = None) -> pd.DataFrame:
+    """
+    Builds the cross-ticker features (e.g. Close_AAPL) for every row by a date-indexed gather
+    from the long price data, instead of pivoting and merging the wide table back.
+
+    Parameters:
+        df_tickers (pd.DataFrame): Long price data with one row per Date and Ticker.
+        peers (list): Tickers whose prices become features. Defaults to every ticker in df_tickers.
+
+    Returns:
+        pd.DataFrame: The rows of df_tickers without their own price columns, followed by one
+                      column per price field and peer in the same order the model was trained on.
+    """
+    dates, date_idx = np.unique(df_tickers["Date"].to_numpy(), return_inverse=True)
+    tickers, ticker_idx = np.unique(df_tickers["Ticker"].to_numpy(), return_inverse=True)
+    peers = tickers if peers is None else np.asarray(peers)
+    peer_idx = np.searchsorted(tickers, peers)
+
+    # Prices stored once per (date, ticker), then gathered for each row's date
+    grid = np.full((len(dates), len(tickers), len(PEER_FIELDS)), np.nan)
+    grid[date_idx, ticker_idx] = df_tickers[PEER_FIELDS].to_numpy(dtype=float)
+    block = grid[date_idx[:, None], peer_idx[None, :]].transpose(0, 2, 1).reshape(len(df_tickers), -1)
+
+    columns = [f"{field}_{peer}" for field in PEER_FIELDS for peer in peers]
+    base = df_tickers.drop(columns=PEER_FIELDS + ["Dividend Paid"]).reset_index(drop=True)
+    return pd.concat([base, pd.DataFrame(block, columns=columns)], axis=1)
+
+MODEL_PATH = "resources/model/xgb.joblib"
+# Published by machine_learning/model_registry.py: <version>/model.ubj plus an ACTIVE pointer
+MODEL_REGISTRY_DIR = "resources/model/registry"
+# Optional per-ticker models: copy a version directory written by machine_learning/model_fleet.py here
+FLEET_MANIFEST = "resources/model/fleet/fleet.json"
+# How often the model watcher checks the model files for a new version
+MODEL_POLL_SECONDS = 5
+# How long a request waits for the first model load before giving up
+MODEL_LOAD_TIMEOUT_SECONDS = 120
+
+def load_fleet(manifest_path: str = FLEET_MANIFEST):
+    """
+    Loads the per-ticker model fleet described by a fleet.json manifest.
+
+    Returns:
+        tuple: ({ticker: model file}, {model file: model}), or None if there is no fleet.
+    """
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        routes = json.load(f)["models"]
+    fleet_dir = os.path.dirname(manifest_path)
+    models = {name: joblib.load(os.path.join(fleet_dir, name)) for name in set(routes.values())}
+    return routes, models
+
+def load_model():
+    """
+    Loads the active model of the app's registry from its native UBJSON file, which XGBoost
+    reads directly without unpickling. Falls back to the pickled MODEL_PATH when no model
+    has been published.
+    """
+    active_path = os.path.join(MODEL_REGISTRY_DIR, "ACTIVE")
+    if not os.path.exists(active_path):
+        return joblib.load(MODEL_PATH)
+    with open(active_path) as f:
+        version = f.read().strip()
+    return xgb.Booster(model_file=os.path.join(MODEL_REGISTRY_DIR, version, "model.ubj"))
+
+def model_predict(model, X: pd.DataFrame) -> np.ndarray:
+    """
+    Predicts with model on the columns of X it was trained on, in its own order. Compacted
+    models (machine_learning/model_compaction.py) only read their top features, so only
+    those columns are copied into the DMatrix.
+    """
+    return model.predict(xgb.DMatrix(X[model.feature_names]))
+
+def warm_up(model):
+    """Runs one prediction on an all-missing row, so the first real request skips XGBoost's lazy set-up."""
+    model.predict(xgb.DMatrix(np.full((1, model.num_features()), np.nan), feature_names=model.feature_names))
+
+class ModelStore:
+    """
+    Process-wide holder of the prediction models: the global model and the optional fleet.
+
+    A daemon thread loads and warms up the models, then polls the files they come from
+    (the registry's ACTIVE pointer, MODEL_PATH and FLEET_MANIFEST). When one of them changes,
+    the new models are loaded and warmed up in the background and swapped in with a single
+    assignment, so a request sees either the old set or the new one, never a mix. If loading
+    fails, the current models stay in use and the load is retried at the next poll.
+    """
+
+    def __init__(self, poll_seconds: float = MODEL_POLL_SECONDS, load_timeout: float = MODEL_LOAD_TIMEOUT_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.load_timeout = load_timeout
+        self._models = None
+        self._signature = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._watch, name="model-watcher", daemon=True).start()
+
+    @staticmethod
+    def file_signature(path: str):
+        """Modification time and size of a file, None if it does not exist (even if removed while checking)."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def files_signature(cls) -> tuple:
+        """Modification time and size of every model file, None for the missing ones."""
+        paths = [os.path.join(MODEL_REGISTRY_DIR, "ACTIVE"), MODEL_PATH, FLEET_MANIFEST]
+        return tuple(cls.file_signature(path) for path in paths)
+
+    def _load(self) -> tuple:
+        model, fleet = load_model(), load_fleet()
+        for each in [model] + (list(fleet[1].values()) if fleet else []):
+            warm_up(each)
+        return model, fleet
+
+    def _watch(self):
+        # Nothing may escape the loop: a dead watcher would stop hot reloads for the life of the server
+        while True:
+            try:
+                signature = self.files_signature()
+                if signature != self._signature:
+                    self._models = self._load()
+                    self._signature = signature
+                    logging.info("Prediction models loaded.")
+            except Exception:
+                logging.error("Could not load the prediction models; keeping the current ones.", exc_info=True)
+            finally:
+                self._ready.set()
+            time.sleep(self.poll_seconds)
+
+    def current(self) -> tuple:
+        """
+        Returns the (global model, fleet) pair in use, waiting for the first load.
+
+        Raises:
+            TimeoutError: If the first load has not finished within load_timeout seconds.
+            FileNotFoundError: If no model could be loaded yet.
+        """
+        if not self._ready.wait(self.load_timeout):
+            raise TimeoutError(f"The prediction models did not load within {self.load_timeout}s; check the server log.")
+        if self._models is None:
+            raise FileNotFoundError("No prediction model could be loaded; check the model files and the server log.")
+        return self._models
+
+@st.cache_resource
+def get_model_store() -> ModelStore:
+    """The ModelStore shared by every session of this server process."""
+    return ModelStore()
+
+def predict_probabilities(X: pd.DataFrame, tickers: pd.Series) -> np.ndarray:
+    """
+    Up-move probabilities for the feature rows X, routing each row to its ticker's fleet model
+    when a fleet is installed. Rows are grouped by model so every model predicts once on all of
+    its rows; tickers without a fleet model (or every row, without a fleet) use the global model.
+    The models come from the process-wide ModelStore, so nothing is loaded per call.
+    """
+    global_model, fleet = get_model_store().current()
+    if fleet is None:
+        return model_predict(global_model, X)
+
+    routes, models = fleet
+    predictions = np.empty(len(X))
+    model_of_row = pd.Series(tickers.to_numpy()).map(routes)
+    for name, rows in model_of_row.groupby(model_of_row.fillna(""), sort=False).indices.items():
+        model = models[name] if name else global_model
+        predictions[rows] = model_predict(model, X.iloc[rows])
+    return predictions
+
+# Start loading and warming up the models as soon as the app imports utils, off the request path
+get_model_store()
+
 def fetch_latest_ohlc(tickers):
     """
     Fetches the latest OHLC data for a list of tickers.
@@ -291,30 +449,25 @@ def predict_market(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: A DataFrame containing the original 'Date' and 'Ticker' columns, along with a new 'Prediction' column.
 
     Process:
-        - Loads a pre-trained XGBoost model from the specified file path.
         - Extracts and stores 'Date' and 'Ticker' columns separately.
         - Drops non-feature columns before making predictions.
-        - Converts the dataset into an XGBoost DMatrix format for efficient prediction.
-        - Generates market movement predictions using the loaded model.
+        - Generates market movement predictions with the pre-trained model, or with each
+          ticker's own model when a per-ticker fleet is installed (see predict_probabilities).
         - Merges the predictions back with the 'Date' and 'Ticker' information.
 
     Raises:
         FileNotFoundError: If the model file is missing or cannot be loaded.
+        TimeoutError: If the models are still loading after MODEL_LOAD_TIMEOUT_SECONDS.
         ValueError: If the DataFrame is missing required columns.
     """
-    # Load the trained XGBoost model
-    model = joblib.load("resources/model/xgb.joblib")
-
     # Store the 'Date' and 'Ticker' columns separately
     date_ticker = df[['Date', 'Ticker']]
 
     # Drop the columns before prediction
     X = df.drop(columns=['Date', 'Ticker'])
 
-    dmat = xgb.DMatrix(X)
-
     # Generate predictions
-    predictions = model.predict(dmat)
+    predictions = predict_probabilities(X, df['Ticker'])
 
     # Create a DataFrame with the original 'Date' and 'Ticker' and add predictions
     df_predictions = date_ticker.copy()
@@ -433,6 +586,7 @@ def backtest(ticker: list, start_date, end_date, cash: float, tp: float, sl: flo
 
     Raises:
         FileNotFoundError: If the XGBoost model file is missing.
+        TimeoutError: If the models are still loading after MODEL_LOAD_TIMEOUT_SECONDS.
         ValueError: If input parameters are invalid or if the required columns are missing from the dataset.
 
     Notes:
@@ -449,13 +603,9 @@ def backtest(ticker: list, start_date, end_date, cash: float, tp: float, sl: flo
     df = simfin.get_stock_prices_backtest(ticker, start_date, end_date)
     merged_df = simfin.get_predictions_data_backtest(start_date, end_date)
 
-    # Load the pre-trained XGBoost model
-    model = joblib.load("resources/model/xgb.joblib")
+    # Generate predictions with the pre-trained model (or the per-ticker fleet)
     X = merged_df.drop(columns=['Date', 'Ticker'])
-
-    # Generate predictions
-    dmat = xgb.DMatrix(X)
-    predictions = model.predict(dmat)
+    predictions = predict_probabilities(X, merged_df['Ticker'])
     predictions = (predictions > 0.5).astype(int)
 
     df_predictions = df.copy()